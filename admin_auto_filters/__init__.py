@@ -3,3 +3,11 @@ __version__ = '0.8.0'
 # Public constants for the admin autocomplete integration
 ADMIN_AUTOCOMPLETE_VIEW_SLUG = 'admin-autocomplete'
 ADMIN_AUTOCOMPLETE_VIEW_NAME = f'admin:{ADMIN_AUTOCOMPLETE_VIEW_SLUG}'
+
+# Companion endpoint returning the labels of given ids (see views.AutocompleteLabelsView)
+ADMIN_AUTOCOMPLETE_LABELS_VIEW_SLUG = 'admin-autocomplete-labels'
+ADMIN_AUTOCOMPLETE_LABELS_VIEW_NAME = f'admin:{ADMIN_AUTOCOMPLETE_LABELS_VIEW_SLUG}'
+
+# Several autocomplete requests in one (see views.AutocompleteBatchView)
+ADMIN_AUTOCOMPLETE_BATCH_VIEW_SLUG = 'admin-autocomplete-batch'
+ADMIN_AUTOCOMPLETE_BATCH_VIEW_NAME = f'admin:{ADMIN_AUTOCOMPLETE_BATCH_VIEW_SLUG}'
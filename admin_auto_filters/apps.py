@@ -15,10 +15,21 @@ class AdminAutoFiltersConfig(AppConfig):
         from django.contrib import admin
         from django.urls import path
 
-        from . import ADMIN_AUTOCOMPLETE_VIEW_SLUG
-        from .views import AutocompleteJsonView
+        from . import ADMIN_AUTOCOMPLETE_BATCH_VIEW_SLUG, ADMIN_AUTOCOMPLETE_LABELS_VIEW_SLUG, ADMIN_AUTOCOMPLETE_VIEW_SLUG
+        from .conf import get_setting
+        from .filters import track_cached_filter_models
+        from .views import (
+            AsyncAutocompleteJsonView,
+            AutocompleteBatchView,
+            AutocompleteJsonView,
+            AutocompleteLabelsView,
+            async_admin_view,
+            track_autocomplete_targets,
+        )
 
         site = admin.site
+        track_cached_filter_models(site)
+        track_autocomplete_targets(site)
 
         # Prevent multiple patches during autoreload or multiple app loads
         if getattr(site, '_admin_auto_filters_urls_patched', False):
@@ -28,11 +39,22 @@ class AdminAutoFiltersConfig(AppConfig):
 
         def get_urls() -> Sequence['URLResolver | URLResolver | URLPattern | URLPattern']:
             urls = original_get_urls()
+            # Cacheable: the view sets its own Cache-Control (see AutocompleteJsonView.patch_cache_headers())
+            if get_setting('ASYNC_VIEW'):
+                view = async_admin_view(site, AsyncAutocompleteJsonView.as_view(admin_site=site), cacheable=True)
+            else:
+                view = site.admin_view(AutocompleteJsonView.as_view(admin_site=site), cacheable=True)
             extra = [
+                path(f'{ADMIN_AUTOCOMPLETE_VIEW_SLUG}/', view, name=ADMIN_AUTOCOMPLETE_VIEW_SLUG),
                 path(
-                    f'{ADMIN_AUTOCOMPLETE_VIEW_SLUG}/',
-                    site.admin_view(AutocompleteJsonView.as_view(admin_site=site)),
-                    name=ADMIN_AUTOCOMPLETE_VIEW_SLUG,
+                    f'{ADMIN_AUTOCOMPLETE_LABELS_VIEW_SLUG}/',
+                    site.admin_view(AutocompleteLabelsView.as_view(admin_site=site), cacheable=True),
+                    name=ADMIN_AUTOCOMPLETE_LABELS_VIEW_SLUG,
+                ),
+                path(
+                    f'{ADMIN_AUTOCOMPLETE_BATCH_VIEW_SLUG}/',
+                    site.admin_view(AutocompleteBatchView.as_view(admin_site=site)),
+                    name=ADMIN_AUTOCOMPLETE_BATCH_VIEW_SLUG,
                 ),
             ]
             # Prepend so our route takes precedence if names collide (they shouldn't)
@@ -0,0 +1,85 @@
+"""Time budgets for autocomplete queries (see AutocompleteJsonView.query_timeout)."""
+
+from __future__ import annotations
+
+import time
+from contextlib import ExitStack
+from types import TracebackType
+from typing import Any
+
+from django.db import DatabaseError, connections, transaction
+
+# SQLSTATE of a statement cancelled by statement_timeout on PostgreSQL
+QUERY_CANCELED = '57014'
+
+
+class QueryBudget:
+    """
+    Cancels the queries run on database `using` inside `with budget:` once `deadline` (a
+    time.monotonic() value) passes. SQLite gets a progress handler that interrupts the running
+    statement; PostgreSQL runs them in a transaction, and an execute wrapper lowers
+    `SET LOCAL statement_timeout` to the time left before each statement. Other backends run unbudgeted. Catch the DatabaseError and ask is_timeout().
+
+    Inside an outer transaction (ATOMIC_REQUESTS, atomic()), the budget's transaction is a
+    savepoint, whose release would keep the timeout for the rest of the outer transaction; the
+    previous statement_timeout is restored on exit. The SQLite progress handler replaces any
+    handler already set on the connection, which is removed on exit (sqlite3 cannot read it).
+    """
+
+    # SQLite virtual machine instructions between deadline checks
+    progress_steps = 1000
+
+    def __init__(self, using: str, deadline: float) -> None:
+        self.connection = connections[using]
+        self.deadline = deadline
+        self.expired = False
+        self._stack = ExitStack()
+
+    @property
+    def supported(self) -> bool:
+        return self.connection.vendor in ('sqlite', 'postgresql')
+
+    def __enter__(self) -> QueryBudget:
+        vendor = self.connection.vendor
+        if vendor == 'sqlite':
+            self.connection.ensure_connection()
+            raw = self.connection.connection
+            raw.set_progress_handler(self._check_deadline, self.progress_steps)
+            self._stack.callback(raw.set_progress_handler, None, self.progress_steps)
+        elif vendor == 'postgresql':
+            if self.connection.in_atomic_block:
+                with self.connection.cursor() as cursor:
+                    cursor.execute('SHOW statement_timeout')
+                    # Runs after the savepoint is released or rolled back
+                    self._stack.callback(self._restore_statement_timeout, cursor.fetchone()[0])
+            self._stack.enter_context(transaction.atomic(using=self.connection.alias))
+            self._stack.enter_context(self.connection.execute_wrapper(self._limit_statement))
+        return self
+
+    def _limit_statement(self, execute: Any, sql: Any, params: Any, many: bool, context: dict[str, Any]) -> Any:
+        milliseconds = max(int((self.deadline - time.monotonic()) * 1000), 1)
+        # The DB-API cursor, as the CursorWrapper would run this through the wrapper again
+        context['cursor'].cursor.execute('SET LOCAL statement_timeout = %s', [milliseconds])
+        return execute(sql, params, many, context)
+
+    def _restore_statement_timeout(self, value: str) -> None:
+        if self.connection.needs_rollback or not self.connection.is_usable():
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute("SELECT set_config('statement_timeout', %s, true)", [value])
+
+    def __exit__(self, exc_type: type[BaseException] | None, exc: BaseException | None, traceback: TracebackType | None) -> None:
+        self._stack.__exit__(exc_type, exc, traceback)
+
+    def _check_deadline(self) -> int:
+        if time.monotonic() < self.deadline:
+            return 0
+        self.expired = True
+        return 1
+
+    def is_timeout(self, exc: DatabaseError) -> bool:
+        """Whether `exc` is this budget cancelling a query."""
+        if self.expired:
+            return True
+        cause: Any = exc.__cause__
+        return getattr(cause, 'sqlstate', None) == QUERY_CANCELED or getattr(cause, 'pgcode', None) == QUERY_CANCELED
@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable
+from typing import Any
+
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+
+from .conf import get_setting
+
+KEY_PREFIX = 'admin_auto_filters'
+
+_tracked_models: set[Any] = set()
+_change_listeners: dict[Any, list[Callable[..., None]]] = {}
+
+
+def get_cache() -> Any:
+    return caches[get_setting('CACHE_ALIAS')]
+
+
+def _generation_key(model: Any) -> str:
+    return f'{KEY_PREFIX}:generation:{model._meta.label_lower}'
+
+
+def get_generation(model: Any) -> int:
+    """
+    Return the current generation of `model`; it changes whenever a tracked instance is saved or deleted.
+    Cached entries that embed it in their key are invalidated without being deleted.
+    """
+    cache = get_cache()
+    key = _generation_key(model)
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, 1, timeout=None)
+        generation = cache.get(key, 1)
+    return generation
+
+
+def bump_generation(model: Any) -> int:
+    """Move `model` to a new generation and return it."""
+    cache = get_cache()
+    key = _generation_key(model)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Never read (or evicted): any value differs from what stale keys embed
+        generation = get_generation(model) + 1
+        cache.set(key, generation, timeout=None)
+        return generation
+
+
+def _bump_sender(sender: Any, **kwargs: Any) -> None:
+    generation = bump_generation(sender)
+    for listener in _change_listeners.get(sender, ()):
+        listener(kwargs['instance'], deleted=kwargs['signal'] is post_delete, generation=generation)
+
+
+def add_change_listener(model: Any, listener: Callable[..., None]) -> None:
+    """
+    Call `listener(instance, deleted=..., generation=...)` after each tracked save or delete of
+    `model`, with the generation it was moved to. Idempotent.
+    """
+    track_model(model)
+    listeners = _change_listeners.setdefault(model, [])
+    if listener not in listeners:
+        listeners.append(listener)
+
+
+def track_model(model: Any) -> None:
+    """Bump `model`'s generation on post_save/post_delete. Idempotent."""
+    if model in _tracked_models:
+        return
+    uid = f'{KEY_PREFIX}:{model._meta.label_lower}'
+    post_save.connect(_bump_sender, sender=model, dispatch_uid=uid)
+    post_delete.connect(_bump_sender, sender=model, dispatch_uid=uid)
+    _tracked_models.add(model)
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.failed = False
+        self.result: Any = None
+
+
+class SingleFlight:
+    """
+    In-process request coalescing: concurrent calls of do() with the same key wait for the first
+    one's result instead of computing it again. Nothing is kept once that call returns.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._flights: dict[str, _Flight] = {}
+
+    def do(self, key: str, func: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.done.wait()
+            # The first call raised: try on our own rather than share its exception
+            return func() if flight.failed else flight.result
+        try:
+            flight.result = func()
+        except BaseException:
+            flight.failed = True
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+        return flight.result
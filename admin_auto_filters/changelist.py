@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import weakref
+from collections.abc import Sequence
+from typing import Any
+
+from django.contrib.admin.views.main import ChangeList
+
+from .filters import AutocompleteFilterBase, apply_filter_conditions
+
+
+class CombinedFilterGroup:
+    """
+    Active autocomplete filters of one changelist queryset, applied by a single filter() call.
+
+    The first member adds every member's condition; the others leave the queryset alone.
+    """
+
+    def __init__(self, members: Sequence[AutocompleteFilterBase]) -> None:
+        self.members = list(members)
+
+    def filter(self, filter_obj: AutocompleteFilterBase, queryset: Any) -> Any:
+        if filter_obj is not self.members[0]:
+            return queryset
+
+        conditions: dict[str, Any] = {}
+        for member in self.members:
+            values = member.get_values()
+            if not values:
+                return queryset.none()
+            conditions[member.filter_spec.parameter_name] = member.get_lookup_value(values)
+
+        duplicating = [member for member in self.members if member.may_have_duplicates]
+        return apply_filter_conditions(
+            queryset,
+            conditions,
+            may_have_duplicates=bool(duplicating),
+            strategy=(duplicating or self.members)[0].filter_strategy,
+        )
+
+
+class CombinedFiltersMixin:
+    """
+    ChangeList mixin applying all active autocomplete filters in one `.filter(**conditions)`.
+
+    Lookups through single-valued relations (foreign keys, one-to-one) give the same rows either
+    way. Lookups through multi-valued relations (many-to-many, reverse foreign keys) differ: one
+    filter() call requires a single related row to match every condition on the shared path, while
+    separate calls may match each condition on a different related row. Those filters keep being
+    applied one by one unless `combine_multi_valued_filters` is True.
+    """
+
+    combine_multi_valued_filters = False
+    _exclude_parameters: list[str] | None = None
+
+    def get_queryset(self, request: Any, exclude_parameters: list[str] | None = None) -> Any:
+        # Django 5.0+ facet counts rebuild the queryset without one filter; get_filters() must skip it too
+        self._exclude_parameters = exclude_parameters
+        try:
+            if exclude_parameters is None:
+                return super().get_queryset(request)  # type: ignore[misc]
+            return super().get_queryset(request, exclude_parameters)  # type: ignore[misc]
+        finally:
+            self._exclude_parameters = None
+
+    def get_filters(self, request: Any) -> Any:
+        result = super().get_filters(request)  # type: ignore[misc]
+        members = [
+            filter_spec
+            for filter_spec in result[0]
+            if isinstance(filter_spec, AutocompleteFilterBase)
+            and filter_spec.value()
+            and filter_spec.expected_parameters() != self._exclude_parameters
+            and (self.combine_multi_valued_filters or not filter_spec.may_have_duplicates)
+        ]
+        if len(members) > 1:
+            group = CombinedFilterGroup(members)
+            for member in members:
+                member.filter_group = group
+        return result
+
+
+class CombinedFiltersChangeList(CombinedFiltersMixin, ChangeList):  # type: ignore[misc]
+    pass
+
+
+# ChangeList subclasses without get_results(), per ModelAdmin.get_changelist() class
+_queryset_changelists: weakref.WeakKeyDictionary[type, type] = weakref.WeakKeyDictionary()
+
+
+def _skip_results(self: Any, request: Any) -> None:
+    pass
+
+
+def get_changelist_queryset(model_admin: Any, request: Any, exclude_parameters: list[str] | None = None) -> Any:
+    """
+    The queryset `model_admin`'s changelist shows for `request`: list filters, the search box and
+    the ModelAdmin's hooks, without the filters of `exclude_parameters` (as Django 5.0+ facets).
+    The changelist is built as get_changelist_instance() does, minus get_results(), so no COUNT or
+    page query runs. Raises what ChangeList does for invalid parameters (IncorrectLookupParameters).
+    """
+    changelist_cls = model_admin.get_changelist(request)
+    queryset_cls = _queryset_changelists.get(changelist_cls)
+    if queryset_cls is None:
+        queryset_cls = _queryset_changelists[changelist_cls] = type(changelist_cls.__name__, (changelist_cls,), {'get_results': _skip_results})
+    list_display = model_admin.get_list_display(request)
+    list_display_links = model_admin.get_list_display_links(request, list_display)
+    if model_admin.get_actions(request):
+        list_display = ['action_checkbox', *list_display]
+    changelist = queryset_cls(
+        request,
+        model_admin.model,
+        list_display,
+        list_display_links,
+        model_admin.get_list_filter(request),
+        model_admin.date_hierarchy,
+        model_admin.get_search_fields(request),
+        model_admin.get_list_select_related(request),
+        model_admin.list_per_page,
+        model_admin.list_max_show_all,
+        model_admin.list_editable,
+        model_admin,
+        model_admin.get_sortable_by(request),
+        model_admin.search_help_text,
+    )
+    if exclude_parameters is None:
+        return changelist.get_queryset(request)
+    return changelist.get_queryset(request, exclude_parameters)
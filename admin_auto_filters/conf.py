@@ -0,0 +1,53 @@
+from __future__ import annotations
+
+from typing import Any
+
+from django.conf import settings
+
+SETTINGS_PREFIX = 'ADMIN_AUTO_FILTERS_'
+
+DEFAULTS: dict[str, Any] = {
+    # Alias from settings.CACHES used by every admin_auto_filters cache
+    'CACHE_ALIAS': 'default',
+    # Seconds a rendered filter widget stays cached (AutocompleteFilterBase.cache_rendered_widget)
+    'WIDGET_CACHE_TIMEOUT': 300,
+    # Cache AutocompleteJsonView responses (AutocompleteJsonView.cache_results overrides it)
+    'RESULTS_CACHE': False,
+    # Seconds an autocomplete response stays cached
+    'RESULTS_CACHE_TIMEOUT': 60,
+    # Paginate AutocompleteJsonView by primary key instead of COUNT + OFFSET (AutocompleteJsonView.keyset_pagination)
+    'KEYSET_PAGINATION': False,
+    # Seconds the cursor of the next keyset page is remembered for Select2's page numbers
+    'KEYSET_CURSOR_TIMEOUT': 600,
+    # SearchBackend of autocomplete searches, class or dotted path (AutocompleteJsonView.search_backend)
+    'SEARCH_BACKEND': 'admin_auto_filters.search.ModelAdminSearchBackend',
+    # Try exact, then prefix matches on indexed search fields before the full search (AutocompleteJsonView.tiered_search)
+    'TIERED_SEARCH': False,
+    # Shorter terms are not searched (AutocompleteJsonView.min_term_length, filters' min_term_length)
+    'MIN_TERM_LENGTH': 0,
+    # Cached unsearched results a short term is matched against; 0 gives short terms an empty page
+    'SHORT_TERM_RESULTS': 0,
+    # Concurrent identical autocomplete requests of a process share one computation (AutocompleteJsonView.coalesce_requests)
+    'COALESCE_REQUESTS': False,
+    # Serve admin:admin-autocomplete with AsyncAutocompleteJsonView (for ASGI deployments)
+    'ASYNC_VIEW': False,
+    # ETags of autocomplete responses: None, 'payload' or 'generation' (AutocompleteJsonView.etags)
+    'ETAGS': None,
+    # Seconds browsers may reuse an autocomplete response (Cache-Control: private, max-age); 0 keeps never_cache
+    'BROWSER_CACHE_MAX_AGE': 0,
+    # Tables with more rows are not indexed by NgramSearchBackend; searches on them go to the database
+    'NGRAM_INDEX_MAX_ROWS': 200_000,
+    # Terms matching more rows are searched in the database rather than with a long pk IN (...)
+    'NGRAM_INDEX_MAX_MATCHES': 1000,
+    # Database alias of autocomplete searches and label lookups, e.g. a read replica; None lets the routers choose
+    'READ_DATABASE': None,
+    # Retry a read that fails on READ_DATABASE on the routers' database
+    'READ_DATABASE_FALLBACK': False,
+    # Seconds autocomplete result queries may take before returning the rows fetched so far (AutocompleteJsonView.query_timeout); None: no limit
+    'QUERY_TIMEOUT': None,
+}
+
+
+def get_setting(name: str) -> Any:
+    """Return `settings.ADMIN_AUTO_FILTERS_<name>`, falling back to the package default."""
+    return getattr(settings, SETTINGS_PREFIX + name, DEFAULTS[name])
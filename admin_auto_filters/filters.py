@@ -1,6 +1,10 @@
 from __future__ import annotations
 
-from collections.abc import Callable, Sequence
+import functools
+import hashlib
+import weakref
+from collections.abc import Callable, Iterable, Sequence
+from dataclasses import dataclass
 from typing import Any
 
 from django import VERSION as DJANGO_VERSION
@@ -13,23 +17,214 @@ from django.contrib.admin.widgets import (
 from django.contrib.admin.widgets import (
     AutocompleteSelectMultiple as AutocompleteSelectMultipleBase,
 )
+from django.core import signing
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.models import Count, Exists, OuterRef
 from django.db.models.constants import LOOKUP_SEP  # this is '__'
 from django.db.models.fields.related import ForeignObjectRel
 from django.db.models.fields.related_descriptors import (
     ManyToManyDescriptor,
     ReverseManyToOneDescriptor,
 )
+from django.dispatch import receiver
 from django.forms import widgets as forms_widgets
-from django.forms.widgets import Media
-from django.urls import reverse
-
-from . import ADMIN_AUTOCOMPLETE_VIEW_NAME
+from django.urls import get_script_prefix, get_urlconf, reverse
+from django.utils.functional import cached_property
+from django.utils.http import urlencode
+from django.utils.safestring import mark_safe
+from django.utils.translation import get_language
+from django.utils.translation import gettext_lazy as _
+
+from . import ADMIN_AUTOCOMPLETE_LABELS_VIEW_NAME, ADMIN_AUTOCOMPLETE_VIEW_NAME
+from .cache import KEY_PREFIX, get_cache, get_generation, track_model
+from .conf import SETTINGS_PREFIX, get_setting
+from .labels import LabelResolver
+from .media import filter_media
+from .routing import get_read_database
 
 # Django does not expose precise typing for these in stubs
 MEDIA_TYPES: tuple[str, ...] = ('css', 'js')
 media_property = forms_widgets.media_property  # type: ignore[attr-defined]
 
 
+FILTER_STRATEGY_DISTINCT = 'distinct'
+FILTER_STRATEGY_SUBQUERY = 'subquery'
+FILTER_STRATEGY_EXISTS = 'exists'
+FILTER_STRATEGIES: tuple[str, ...] = (FILTER_STRATEGY_DISTINCT, FILTER_STRATEGY_SUBQUERY, FILTER_STRATEGY_EXISTS)
+
+# Query parameter of the autocomplete URL carrying a signed facet context (see get_facets_token())
+FACETS_QUERY_PARAM = 'facets'
+FACETS_SALT = 'admin_auto_filters.facets'
+# Query parameter of the autocomplete URL raising the view's minimum term length (see AutocompleteJsonView.get_min_term_length())
+MIN_TERM_LENGTH_QUERY_PARAM = 'min_term_length'
+# Query parameter of the autocomplete URL shortening the view's query timeout (see AutocompleteJsonView.get_query_timeout())
+QUERY_TIMEOUT_QUERY_PARAM = 'query_timeout'
+
+
+def apply_filter_conditions(queryset: Any, conditions: dict[str, Any], *, may_have_duplicates: bool, strategy: str) -> Any:
+    """
+    Filter `queryset` by `conditions` (one filter() call).
+
+    When the lookups may span multi-valued relations, duplicates are removed according to `strategy`:
+        * 'distinct': SELECT DISTINCT over the changelist rows (Django admin's behaviour).
+        * 'subquery': pk IN (SELECT pk ... WHERE conditions); no DISTINCT on the outer query.
+        * 'exists': WHERE EXISTS (SELECT ... WHERE pk = outer.pk AND conditions).
+    """
+    if strategy not in FILTER_STRATEGIES:
+        raise ImproperlyConfigured(f'Unknown filter_strategy {strategy!r}; expected one of {", ".join(FILTER_STRATEGIES)}.')
+    if not may_have_duplicates:
+        return queryset.filter(**conditions)
+    if strategy == FILTER_STRATEGY_SUBQUERY:
+        matching = queryset.model._base_manager.filter(**conditions).values('pk')
+        return queryset.filter(pk__in=matching)
+    if strategy == FILTER_STRATEGY_EXISTS:
+        matching = queryset.model._base_manager.filter(pk=OuterRef('pk'), **conditions)
+        return queryset.filter(Exists(matching))
+    return queryset.distinct().filter(**conditions)
+
+
+def get_lookup_path(parameter_name: str) -> str:
+    """`parameter_name` without its trailing 'exact'/'in' lookup, e.g. 'author__pk' for 'author__pk__exact'."""
+    parts = parameter_name.split(LOOKUP_SEP)
+    if len(parts) > 1 and parts[-1] in ('exact', 'in'):
+        parts.pop()
+    return LOOKUP_SEP.join(parts)
+
+
+def count_facets(queryset: Any, path: str, values: Sequence[Any], *, max_rows: int | None) -> tuple[dict[str, int], bool]:
+    """
+    Count the rows of `queryset` matching each of `values` at `path`, in one GROUP BY query.
+
+    Returns ({str(value): count}, truncated). With `max_rows`, at most that many matching rows are
+    counted (where the database supports LIMIT in IN subqueries); `truncated` then tells whether
+    the counts may be lower bounds.
+    """
+    if not values:
+        return {}, False
+    lookup = {f'{path}{LOOKUP_SEP}in': values}
+    matching = queryset.order_by().filter(**lookup)
+    limited = max_rows is not None and connections[queryset.db].features.allow_sliced_subqueries_with_in
+    if limited:
+        rows = matching.values('pk')[:max_rows]
+        matching = queryset.model._base_manager.using(queryset.db).filter(pk__in=rows, **lookup)
+    counts = {
+        str(value): count
+        for value, count in matching.order_by().values(path).annotate(facet_count=Count('pk', distinct=True)).values_list(path, 'facet_count')
+    }
+    return counts, limited and sum(counts.values()) >= max_rows  # type: ignore[operator]
+
+
+def format_facet_count(label: Any, count: int, truncated: bool) -> str:
+    return f'{label} ({count}{"+" if truncated else ""})'
+
+
+@dataclass(frozen=True)
+class FilterSpec:
+    """
+    Field/model metadata a filter needs, resolved once per (filter class, model, model admin class).
+    It holds no queryset: get_field_queryset() rebuilds one per request from get_queryset_for_field().
+    """
+
+    parameter_name: str
+    rel_model: Any
+    remote_field: Any
+    to_field_name: str
+    # Model of the objects the filter selects (get_queryset_for_field()'s model)
+    related_model: Any
+    may_have_duplicates: bool
+    # Field whose to_python() coerces the parameter's values; None leaves them as strings
+    target_field: Any = None
+    # Relations get_field_queryset() applies for labelling the selected objects
+    select_related: tuple[str, ...] = ()
+    prefetch_related: tuple[str, ...] = ()
+    # Database alias get_field_queryset() reads from (see AutocompleteFilterBase.using); None lets the routers choose
+    using: str | None = None
+
+
+# Weakly keyed by filter class, then by (model, model admin class): classes built per request
+# (e.g. AutocompleteFilterFactory() in get_list_filter()) are dropped with their specs.
+_filter_specs: weakref.WeakKeyDictionary[type, dict[tuple[type, type], FilterSpec]] = weakref.WeakKeyDictionary()
+
+
+def clear_filter_spec_cache() -> None:
+    """
+    Forget every resolved FilterSpec.
+    Call this from tests, or after swapping models or admin classes at runtime.
+    """
+    _filter_specs.clear()
+
+
+@receiver(setting_changed)
+def _clear_filter_specs(*, setting: str, **kwargs: Any) -> None:
+    if setting == f'{SETTINGS_PREFIX}READ_DATABASE':
+        clear_filter_spec_cache()
+
+
+def get_to_field_name(remote_field: Any) -> str:
+    """The attname autocomplete widgets use as option values for `remote_field` (as Django's optgroups())."""
+    remote_model_opts = remote_field.remote_field.model._meta
+    to_field_name = getattr(remote_field.remote_field, 'field_name', remote_model_opts.pk.attname)
+    return remote_model_opts.get_field(to_field_name).attname
+
+
+def get_target_field(parameter_name: str, field_name: str, remote_field: Any, related_model: Any) -> Any:
+    """
+    The field whose values `parameter_name` compares against, e.g. the related pk for
+    `author__pk__exact` or the relation's target field for `author__in`; None if unknown.
+    """
+    last = get_lookup_path(parameter_name).split(LOOKUP_SEP)[-1]
+    if last == field_name:
+        return getattr(remote_field, 'target_field', None)
+    if last == 'pk':
+        return related_model._meta.pk
+    try:
+        return related_model._meta.get_field(last)
+    except FieldDoesNotExist:
+        return None
+
+
+def get_qualified_name(obj: Any) -> str:
+    """
+    A name of `obj` that is the same in every process: module and qualname, plus the first line
+    of functions, as lambdas and nested functions of one module share a qualname. Strings are kept.
+    """
+    if isinstance(obj, str):
+        return obj
+    name = f'{getattr(obj, "__module__", "")}.{getattr(obj, "__qualname__", type(obj).__qualname__)}'
+    code = getattr(obj, '__code__', None)
+    if code is not None:
+        name += f':{code.co_firstlineno}'
+    return name
+
+
+def clean_values(field: Any, candidates: Iterable[Any], max_values: int) -> list[Any]:
+    """
+    The distinct valid values of `candidates`, converted with `field`'s to_python() and checked
+    by its validators (such as the integer range the database accepts), capped at `max_values`.
+    Blank and invalid values are dropped, not passed to the ORM; without a field, values stay strings.
+    """
+    values: list[Any] = []
+    for candidate in candidates:
+        if isinstance(candidate, str):
+            candidate = candidate.strip()
+        if candidate in (None, ''):
+            continue
+        if field is not None:
+            try:
+                candidate = field.to_python(candidate)
+                field.run_validators(candidate)
+            except ValidationError:
+                continue
+        if candidate in values:
+            continue
+        values.append(candidate)
+        if len(values) >= max_values:
+            break
+    return values
+
+
 class AutocompleteSelectMixin:
     def __init__(
         self,
@@ -39,13 +234,60 @@ class AutocompleteSelectMixin:
         choices: Sequence[Any] = (),
         using: str | None = None,
         custom_url: str | None = None,
+        selected_objects: Sequence[Any] | None = None,
+        labels_url: str | None = None,
     ) -> None:
         self.custom_url: str | None = custom_url
+        # Prefetched selected objects (see LabelResolver); None falls back to Django's own query
+        self.selected_objects: Sequence[Any] | None = selected_objects
+        # Selected values render as placeholders that the browser labels from this endpoint
+        self.labels_url: str | None = labels_url
         super().__init__(rel, admin_site, attrs, choices, using)  # type: ignore[call-arg]
 
     def get_url(self) -> str:
         return self.custom_url if self.custom_url else super().get_url()  # type: ignore[misc]
 
+    def build_attrs(self, base_attrs: dict[str, Any], extra_attrs: dict[str, Any] | None = None) -> dict[str, Any]:
+        attrs = super().build_attrs(base_attrs, extra_attrs=extra_attrs)  # type: ignore[misc]
+        if self.labels_url:
+            attrs['data-labels-url'] = self.labels_url
+        return attrs
+
+    def optgroups(self, name: str, value: Any, attr: Any = None) -> list[Any]:
+        if self.labels_url:
+            return self.placeholder_optgroups(name, value)
+        if self.selected_objects is None:
+            return super().optgroups(name, value, attr)  # type: ignore[misc]
+
+        # Mirrors AutocompleteMixin.optgroups(), reading the prefetched objects instead of querying
+        default: tuple[Any, list[Any], int] = (None, [], 0)
+        field = self.choices.field  # type: ignore[attr-defined]
+        selected_choices = {str(v) for v in value if str(v) not in field.empty_values}
+        if not self.is_required and not self.allow_multiple_selected:  # type: ignore[attr-defined]
+            default[1].append(self.create_option(name, '', '', False, 0))  # type: ignore[attr-defined]
+        to_field_name = get_to_field_name(self.field)  # type: ignore[attr-defined]
+        has_selected = False
+        for obj in self.selected_objects:
+            option_value = getattr(obj, to_field_name)
+            if str(option_value) not in selected_choices:
+                continue
+            selected = str(option_value) in value and (has_selected is False or self.allow_multiple_selected)  # type: ignore[attr-defined]
+            has_selected |= selected
+            option = self.create_option(name, option_value, field.label_from_instance(obj), selected_choices, len(default[1]))  # type: ignore[attr-defined]
+            default[1].append(option)
+        return [default]
+
+    def placeholder_optgroups(self, name: str, value: Any) -> list[Any]:
+        """Selected options labelled with their value, without a query; autocomplete_filter_qs.js relabels them."""
+        default: tuple[Any, list[Any], int] = (None, [], 0)
+        field = self.choices.field  # type: ignore[attr-defined]
+        selected_choices = [str(v) for v in value if str(v) not in field.empty_values]
+        if not self.is_required and not self.allow_multiple_selected:  # type: ignore[attr-defined]
+            default[1].append(self.create_option(name, '', '', False, 0))  # type: ignore[attr-defined]
+        for option_value in selected_choices if self.allow_multiple_selected else selected_choices[:1]:  # type: ignore[attr-defined]
+            default[1].append(self.create_option(name, option_value, option_value, True, len(default[1])))  # type: ignore[attr-defined]
+        return [default]
+
 
 class AutocompleteSelect(AutocompleteSelectMixin, AutocompleteSelectBase):
     pass
@@ -70,6 +312,30 @@ class AutocompleteFilterBase(admin.SimpleListFilter):
     parameter_name = None
     form_field: type[forms.Field] | None = None
     widget_cls: type[Any] | None = None
+    # How lookups through multi-valued relations avoid duplicate rows: 'distinct', 'subquery' or 'exists'
+    filter_strategy = FILTER_STRATEGY_DISTINCT
+    # Opt-in fragment cache for rendered_widget; timeout None uses ADMIN_AUTO_FILTERS_WIDGET_CACHE_TIMEOUT
+    cache_rendered_widget = False
+    widget_cache_timeout: int | None = None
+    # Valid values kept from the query string; later ones are ignored
+    max_values = 1
+    # Set by CombinedFiltersMixin when this filter's condition is applied together with others
+    filter_group: Any = None
+    # Django 5.0+ facets: counts for the selected values and autocomplete results, one GROUP BY each
+    facet_counts = True
+    facet_max_rows: int | None = 10_000
+    changelist: Any = None
+    # Relations the selected objects' labels read; None uses the related ModelAdmin's attributes of the same name
+    label_select_related: Sequence[str] | None = None
+    label_prefetch_related: Sequence[str] | None = None
+    # Shorter terms get an empty page, or the view's top results, without a search
+    min_term_length: int | None = None
+    # Render selected values as placeholders labelled in the browser from the labels endpoint
+    defer_labels = False
+    # Database alias of the selected objects' label lookups; None uses ADMIN_AUTO_FILTERS_READ_DATABASE
+    using: str | None = None
+    # Seconds the autocomplete view's result queries may take, when shorter than its own timeout
+    query_timeout: float | None = None
 
     class Media:
         js = (
@@ -81,53 +347,259 @@ class AutocompleteFilterBase(admin.SimpleListFilter):
         }
 
     def __init__(self, request: Any, params: dict[str, Any], model: Any, model_admin: Any) -> None:
-        if self.parameter_name is None:
-            self.parameter_name = self.generate_parameter_name()
+        self.filter_spec: FilterSpec = self.get_spec(model, model_admin)
+        self.parameter_name = self.filter_spec.parameter_name
+        # Built before super() consumes our param, so the resolver sees every filter's value
+        self.label_resolver = LabelResolver.for_request(request, params, model, model_admin)
         super().__init__(request, params, model, model_admin)
+        self.request = request
+        self.model_admin = model_admin
+        self.may_have_duplicates: bool = self.filter_spec.may_have_duplicates
+        self._add_media(model_admin)
 
-        if self.rel_model:
-            model = self.rel_model
+    @cached_property
+    def rendered_widget(self) -> str:
+        """
+        The filter's widget HTML, built on first access.
+        Changelist code paths that never render the sidebar skip form field, widget and template work.
+        """
+        if not self.cache_rendered_widget or self.show_facets():
+            return self.render_widget()
+
+        cache = get_cache()
+        key = self.get_widget_cache_key()
+        html = cache.get(key)
+        if html is None:
+            html = self.render_widget()
+            timeout = self.widget_cache_timeout
+            cache.set(key, str(html), get_setting('WIDGET_CACHE_TIMEOUT') if timeout is None else timeout)
+        return mark_safe(html)  # noqa: S308 - produced by render_widget()
+
+    def get_widget_cache_key(self) -> str:
+        """
+        Cache key of rendered_widget: everything the HTML depends on, plus the related model's
+        generation so saving or deleting a related object invalidates it. Classes built by
+        AutocompleteFilterFactory() share a qualname, so the options they set are part of it.
+        """
+        related_model = self.filter_spec.related_model
+        form_field = self.get_form_field()
+        parts = (
+            type(self).__module__,
+            type(self).__qualname__,
+            get_qualified_name(form_field),
+            get_qualified_name(getattr(form_field, 'label_item', '')),
+            get_qualified_name(self.widget_cls),
+            urlencode(self.get_autocomplete_params()),
+            str(self.use_deferred_labels()),
+            str(self.filter_spec.using),
+            self.model_admin.model._meta.label_lower,
+            self.model_admin.admin_site.name,
+            self.filter_spec.parameter_name,
+            str(self.used_parameters.get(self.filter_spec.parameter_name, '')),
+            str(self.get_autocomplete_url(self.request, self.model_admin)),
+            str(self.title),
+            get_language() or '',
+            str(get_generation(related_model)),
+        )
+        digest = hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
+        return f'{KEY_PREFIX}:widget:{digest}'
 
-        if DJANGO_VERSION >= (3, 2):
-            remote_field = model._meta.get_field(self.field_name)
-        else:
-            remote_field = model._meta.get_field(self.field_name).remote_field
+    def render_widget(self) -> str:
+        parameter_name = self.filter_spec.parameter_name
+        values = self.get_values()
+        value = self.get_lookup_value(values) if values else ''
 
-        assert self.widget_cls is not None, 'widget_cls must be defined'
-        widget = self.widget_cls(
-            remote_field,
-            model_admin.admin_site,
-            custom_url=self.get_autocomplete_url(request, model_admin),
-        )
+        queryset = self.get_field_queryset()
+        if values and self.use_deferred_labels():
+            widget = self.get_widget(labels_url=self.get_labels_url())
+        else:
+            widget = self.get_widget(
+                selected_objects=self.label_resolver.get_objects(self.filter_spec, values, queryset) if values else (),
+            )
         form_field = self.get_form_field()
         assert form_field is not None, 'form_field or get_form_field() must be defined'
         field = form_field(
-            queryset=self.get_queryset_for_field(model, self.field_name),
+            queryset=queryset,
             widget=widget,
             required=False,
         )
+        if values and self.show_facets():
+            counts, truncated = self.selected_counts
+            label_from_instance = field.label_from_instance  # type: ignore[attr-defined]
+            to_field_name = self.filter_spec.to_field_name
 
-        # Django 4.2+ exposes this in django.contrib.admin.utils
-        self.may_have_duplicates: bool = admin_utils.lookup_spawns_duplicates(
-            model_admin.model._meta,
-            self.parameter_name,
-        )
-        self._add_media(model_admin, widget)
+            def label_with_count(obj: Any) -> str:
+                return format_facet_count(label_from_instance(obj), counts.get(str(getattr(obj, to_field_name)), 0), truncated)
+
+            field.label_from_instance = label_with_count  # type: ignore[attr-defined]
 
         attrs = self.widget_attrs.copy()
-        attrs['id'] = f'id-{self.parameter_name}-dal-filter'
+        attrs['id'] = f'id-{parameter_name}-dal-filter'
         if self.is_placeholder_title:
             # Upper case letter P as dirty hack for bypass django2 widget force placeholder value as empty string ("")
             attrs['data-Placeholder'] = self.title
-        value = self.used_parameters.get(self.parameter_name, '')
-        if value:
-            value = self.normalize_value(str(value))
-        self.rendered_widget = field.widget.render(
-            name=self.parameter_name,
+        return field.widget.render(
+            name=parameter_name,
             value=value,
             attrs=attrs,
         )
 
+    def get_widget(self, **kwargs: Any) -> Any:
+        assert self.widget_cls is not None, 'widget_cls must be defined'
+        widget = self.widget_cls(
+            self.filter_spec.remote_field,
+            self.model_admin.admin_site,
+            custom_url=self.get_autocomplete_url(self.request, self.model_admin),
+            using=self.filter_spec.using,
+            **kwargs,
+        )
+        params = self.get_autocomplete_params()
+        if params:
+            url = widget.get_url()
+            widget.custom_url = f'{url}{"&" if "?" in url else "?"}{urlencode(params)}'
+        return widget
+
+    def use_deferred_labels(self) -> bool:
+        """
+        Whether selected values render as placeholders labelled from get_labels_url() (`defer_labels`).
+        The default labels view labels like the default autocomplete view, with display_text(), so
+        filters with a custom `label_by`/label_from_instance() or autocomplete URL (a `viewname`
+        view may label differently) render their labels on the server unless get_labels_url() is overridden.
+        """
+        if not self.defer_labels or self.show_facets():
+            return False
+        if type(self).get_labels_url is not AutocompleteFilterBase.get_labels_url:
+            return True
+        form_field = self.get_form_field()
+        labels_by_str = getattr(form_field, 'label_item', None) is str or (
+            getattr(form_field, 'label_from_instance', None) is forms.ModelChoiceField.label_from_instance
+        )
+        autocomplete_url = self.get_autocomplete_url(self.request, self.model_admin)
+        return labels_by_str and autocomplete_url in (None, cached_reverse(ADMIN_AUTOCOMPLETE_VIEW_NAME))
+
+    def get_labels_url(self) -> str:
+        """URL of the AutocompleteLabelsView that labels deferred selected values."""
+        return cached_reverse(ADMIN_AUTOCOMPLETE_LABELS_VIEW_NAME)
+
+    def get_autocomplete_params(self) -> dict[str, str]:
+        """Extra query parameters of this filter's autocomplete URL."""
+        params = {}
+        token = self.get_facets_token()
+        if token:
+            params[FACETS_QUERY_PARAM] = token
+        if self.min_term_length:
+            params[MIN_TERM_LENGTH_QUERY_PARAM] = str(self.min_term_length)
+        if self.query_timeout:
+            params[QUERY_TIMEOUT_QUERY_PARAM] = str(self.query_timeout)
+        return params
+
+    def show_facets(self) -> bool:
+        """Whether counts are shown: the filter allows them and the changelist has facets on."""
+        return self.facet_counts and getattr(self.changelist, 'add_facets', False)
+
+    @cached_property
+    def selected_counts(self) -> tuple[dict[str, int], bool]:
+        """Facet counts of the selected values over the changelist queryset without this filter."""
+        filtered_qs = self.changelist.get_queryset(self.request, exclude_parameters=self.expected_parameters())
+        path = get_lookup_path(self.filter_spec.parameter_name)
+        return count_facets(filtered_qs, path, self.get_values(), max_rows=self.facet_max_rows)
+
+    def get_facets_token(self) -> str | None:
+        """
+        Signed facet context for the autocomplete endpoint: changelist model, lookup path and the
+        changelist's query parameters, from which it rebuilds the changelist queryset without this
+        filter, as selected_counts does. None when facets are off.
+        """
+        if not self.show_facets():
+            return None
+        context = {
+            'model': self.model_admin.model._meta.label_lower,
+            'path': get_lookup_path(self.filter_spec.parameter_name),
+            'params': dict(self.request.GET.lists()),
+            'exclude': self.expected_parameters(),
+            'max_rows': self.facet_max_rows,
+        }
+        return signing.dumps(context, salt=FACETS_SALT, compress=True)
+
+    @classmethod
+    def get_rel_model(cls, model: Any) -> Any:  # noqa: ARG003 - hook for subclasses
+        """Return the model that declares `field_name`, or None to use the changelist model."""
+        return cls.rel_model
+
+    @classmethod
+    def resolve_spec(cls, model: Any, model_admin: Any) -> FilterSpec:
+        """Return the cached FilterSpec for this filter class without instantiating it."""
+        # __init__ is skipped on purpose: spec resolution only reads class-level configuration
+        return cls.__new__(cls).get_spec(model, model_admin)
+
+    def get_spec(self, model: Any, model_admin: Any) -> FilterSpec:
+        specs = _filter_specs.setdefault(type(self), {})
+        key = (model, type(model_admin))
+        spec = specs.get(key)
+        if spec is None:
+            spec = specs[key] = self.build_spec(model, model_admin)
+        return spec
+
+    def build_spec(self, model: Any, model_admin: Any) -> FilterSpec:
+        """Resolve field/model metadata; the result is cached by get_spec()."""
+        parameter_name = self.parameter_name
+        if parameter_name is None:
+            parameter_name = self.generate_parameter_name()
+
+        rel_model = self.get_rel_model(model) or model
+        if DJANGO_VERSION >= (3, 2):
+            remote_field = rel_model._meta.get_field(self.field_name)
+        else:
+            remote_field = rel_model._meta.get_field(self.field_name).remote_field
+
+        related_model = self.get_queryset_for_field(rel_model, self.field_name).model
+        select_related, prefetch_related = self.get_label_relations(model_admin, related_model)
+        spec = FilterSpec(
+            parameter_name=parameter_name,
+            rel_model=rel_model,
+            remote_field=remote_field,
+            to_field_name=get_to_field_name(remote_field),
+            related_model=related_model,
+            # Django 4.2+ exposes this in django.contrib.admin.utils
+            may_have_duplicates=admin_utils.lookup_spawns_duplicates(model_admin.model._meta, parameter_name),
+            target_field=get_target_field(parameter_name, self.field_name, remote_field, related_model),
+            select_related=select_related,
+            prefetch_related=prefetch_related,
+            using=get_read_database(self.using),
+        )
+        if self.cache_rendered_widget:
+            track_model(related_model)
+        return spec
+
+    def get_field_queryset(self) -> Any:
+        """
+        The queryset of the objects this filter selects, on the spec's database with its label relations.
+        Built from get_queryset_for_field() on every call, so it is never shared across requests.
+        """
+        spec = self.filter_spec
+        queryset = self.get_queryset_for_field(spec.rel_model, self.field_name)
+        if spec.using is not None:
+            queryset = queryset.using(spec.using)
+        if spec.select_related:
+            queryset = queryset.select_related(*spec.select_related)
+        if spec.prefetch_related:
+            queryset = queryset.prefetch_related(*spec.prefetch_related)
+        return queryset
+
+    def get_label_relations(self, model_admin: Any, related_model: Any) -> tuple[tuple[str, ...], tuple[str, ...]]:
+        """
+        The (select_related, prefetch_related) lookups for labelling selected objects: the filter's
+        `label_select_related`/`label_prefetch_related`, else those of the related model's ModelAdmin.
+        """
+        related_admin = model_admin.admin_site._registry.get(related_model)
+        select_related = self.label_select_related
+        if select_related is None:
+            select_related = getattr(related_admin, 'label_select_related', None) or ()
+        prefetch_related = self.label_prefetch_related
+        if prefetch_related is None:
+            prefetch_related = getattr(related_admin, 'label_prefetch_related', None) or ()
+        return tuple(select_related), tuple(prefetch_related)
+
     @staticmethod
     def get_queryset_for_field(model: Any, name: str) -> Any:
         try:
@@ -157,18 +629,8 @@ class AutocompleteFilterBase(admin.SimpleListFilter):
         """Return the type of form field to be used."""
         return self.form_field
 
-    def _add_media(self, model_admin: Any, widget: Any) -> None:
-        if not hasattr(model_admin, 'Media'):
-            model_admin.__class__.Media = type('Media', (object,), {})
-            model_admin.__class__.media = media_property(model_admin.__class__)
-
-        def _get_media(obj: Any) -> Media:
-            return Media(media=getattr(obj, 'Media', None))
-
-        media = _get_media(model_admin) + widget.media + _get_media(AutocompleteFilterBase) + _get_media(self)
-
-        for name in MEDIA_TYPES:
-            setattr(model_admin.Media, name, getattr(media, '_' + name))
+    def _add_media(self, model_admin: Any) -> None:
+        filter_media.register(model_admin, self, self.widget_cls, lambda: self.get_widget().media)
 
     def has_output(self) -> bool:
         return True
@@ -176,6 +638,18 @@ class AutocompleteFilterBase(admin.SimpleListFilter):
     def lookups(self, request: Any, model_admin: Any) -> tuple:
         return ()
 
+    def choices(self, changelist: Any) -> Any:
+        # No lookup choices to count one by one; rendered_widget shows the facets
+        self.changelist = changelist
+        yield {
+            'selected': self.value() is None,
+            'query_string': changelist.get_query_string(remove=[self.parameter_name]),
+            'display': _('All'),
+        }
+
+    def get_facet_counts(self, pk_attname: str, filtered_qs: Any) -> dict[str, Any]:
+        return {}
+
     def generate_parameter_name(self) -> str:
         return self.field_name
 
@@ -183,15 +657,44 @@ class AutocompleteFilterBase(admin.SimpleListFilter):
     def normalize_value(cls, value: str) -> Any:
         return value
 
-    def queryset(self, request: Any, queryset: Any) -> Any:
+    @classmethod
+    def coerce_values(cls, spec: FilterSpec, value: str) -> list[Any]:
+        """
+        Return the valid, distinct values of the raw `value`, converted and validated by the target
+        field and capped at `max_values` (see clean_values()). Invalid values are dropped, not passed to the ORM.
+        """
+        normalized = cls.normalize_value(value)
+        candidates = normalized if isinstance(normalized, list | tuple) else [normalized]
+        return clean_values(spec.target_field, candidates, cls.max_values)
+
+    def get_values(self) -> list[Any]:
+        """Coerced values of the current request (empty when the filter is inactive or all values are invalid)."""
         value = self.value()
         if not value:
-            return queryset
+            return []
+        return self.coerce_values(self.filter_spec, str(value))
 
-        if self.may_have_duplicates:
-            queryset = queryset.distinct()
+    def get_lookup_value(self, values: list[Any]) -> Any:
+        """The right-hand side of the filter lookup for the non-empty coerced `values`."""
+        return values[0]
 
-        return queryset.filter(**{self.parameter_name: self.normalize_value(value)})
+    def queryset(self, request: Any, queryset: Any) -> Any:
+        if not self.value():
+            return queryset
+        if self.filter_group is not None:
+            return self.filter_group.filter(self, queryset)
+
+        values = self.get_values()
+        if not values:
+            # Nothing valid to look up: no rows, and no query
+            return queryset.none()
+
+        return apply_filter_conditions(
+            queryset,
+            {self.filter_spec.parameter_name: self.get_lookup_value(values)},
+            may_have_duplicates=self.may_have_duplicates,
+            strategy=self.filter_strategy,
+        )
 
     def get_autocomplete_url(self, request: Any, model_admin: Any) -> str | None:
         """
@@ -215,6 +718,7 @@ class AutocompleteFilter(AutocompleteFilterBase):
 class AutocompleteFilterMultiple(AutocompleteFilterBase):
     form_field = forms.ModelMultipleChoiceField
     widget_cls = AutocompleteSelectMultiple
+    max_values = 100
 
     def generate_parameter_name(self) -> str:
         parameter_name = super().generate_parameter_name()
@@ -227,13 +731,61 @@ class AutocompleteFilterMultiple(AutocompleteFilterBase):
     def normalize_value(cls, value: str) -> Sequence[str]:
         return value.split(',')
 
+    def get_lookup_value(self, values: list[Any]) -> Any:
+        return values
+
+
+_reversed_urls: dict[tuple[str, Any, str], str] = {}
+
+
+def cached_reverse(viewname: str) -> str:
+    """reverse() memoized per (viewname, active urlconf, script prefix)."""
+    key = (viewname, get_urlconf(), get_script_prefix())
+    url = _reversed_urls.get(key)
+    if url is None:
+        url = _reversed_urls[key] = reverse(viewname)
+    return url
+
+
+@receiver(setting_changed)
+def _clear_reversed_urls(*, setting: str, **kwargs: Any) -> None:
+    if setting == 'ROOT_URLCONF':
+        _reversed_urls.clear()
+
+
+def track_cached_filter_models(admin_site: Any) -> None:
+    """
+    Start generation tracking for the related models of every cached filter in a static `list_filter`,
+    so processes that never render those changelists still invalidate their fragments on writes.
+    """
+    for model, model_admin in list(admin_site._registry.items()):
+        for list_filter in model_admin.list_filter:
+            if isinstance(list_filter, type) and issubclass(list_filter, AutocompleteFilterBase) and list_filter.cache_rendered_widget:
+                list_filter.resolve_spec(model, model_admin)
+
 
 def generate_choice_field(label_item: Callable[[Any], str] | str) -> type[forms.ModelChoiceField]:
     """
-    Create a ModelChoiceField variant with a modified label_from_instance.
+    Return a ModelChoiceField variant with a modified label_from_instance.
     Note that label_item can be a callable, or a model field, or a model callable.
+    Classes are interned for the CHOICE_FIELD_CACHE_SIZE most recent label_items, so lambdas
+    built per call don't accumulate; unhashable label_items get a fresh class each call.
     """
+    try:
+        return _interned_choice_field(label_item)
+    except TypeError:
+        return _build_choice_field(label_item)
 
+
+CHOICE_FIELD_CACHE_SIZE = 256
+
+
+@functools.lru_cache(maxsize=CHOICE_FIELD_CACHE_SIZE)
+def _interned_choice_field(label_item: Callable[[Any], str] | str) -> type[forms.ModelChoiceField]:
+    return _build_choice_field(label_item)
+
+
+def _build_choice_field(label_item: Callable[[Any], str] | str) -> type[forms.ModelChoiceField]:
     class LabelledModelChoiceField(forms.ModelChoiceField):
         def label_from_instance(self, obj: Any) -> str:
             if callable(label_item):
@@ -248,6 +800,8 @@ def generate_choice_field(label_item: Callable[[Any], str] | str) -> type[forms.
                 raise ValueError(f'Invalid label_item specified: {str(label_item)}')
             return value
 
+    # Read by AutocompleteFilterBase.use_deferred_labels()
+    LabelledModelChoiceField.label_item = label_item  # type: ignore[attr-defined]
     return LabelledModelChoiceField
 
 
@@ -271,6 +825,13 @@ def AutocompleteFilterFactory(  # noqa: N802 - keep public API name
     viewname: str | None = ADMIN_AUTOCOMPLETE_VIEW_NAME,
     use_pk_exact: bool = False,
     label_by: Callable[[Any], str] | str = str,
+    filter_strategy: str | None = None,
+    label_select_related: Sequence[str] | None = None,
+    label_prefetch_related: Sequence[str] | None = None,
+    min_term_length: int | None = None,
+    defer_labels: bool | None = None,
+    using: str | None = None,
+    query_timeout: float | None = None,
 ) -> type[AutocompleteFilterBase]:
     """
     An autocomplete widget filter with a customizable title. Use like this:
@@ -284,8 +845,27 @@ def AutocompleteFilterFactory(  # noqa: N802 - keep public API name
         * use_pk_exact: Whether to use '__pk__exact' in the parameter name when possible.
         * label_by: How to generate the static label for the widget - a callable, the name
           of a model callable, or the name of a model field.
+        * filter_strategy: 'distinct' (default), 'subquery' or 'exists'; see apply_filter_conditions().
+        * label_select_related, label_prefetch_related: relations `label_by` reads, fetched with
+          the selected objects.
+        * min_term_length: shorter search terms are not searched; see AutocompleteJsonView.get_min_term_length().
+        * defer_labels: render selected values as placeholders labelled by the browser; ignored
+          with a custom `label_by` or `viewname` (see AutocompleteFilterBase.use_deferred_labels()).
+        * using: database alias of the selected objects' label lookups.
+        * query_timeout: seconds the autocomplete results may take; see AutocompleteJsonView.get_query_timeout().
     """
 
+    # Class attributes set only when given, so the base class defaults apply otherwise
+    overrides = {
+        'filter_strategy': filter_strategy,
+        'label_select_related': label_select_related,
+        'label_prefetch_related': label_prefetch_related,
+        'min_term_length': min_term_length,
+        'defer_labels': defer_labels,
+        'using': using,
+        'query_timeout': query_timeout,
+    }
+
     class NewMetaFilter(type(AutocompleteFilter)):  # type: ignore[misc]
         """A metaclass for an autogenerated autocomplete filter class."""
 
@@ -297,20 +877,23 @@ def AutocompleteFilterFactory(  # noqa: N802 - keep public API name
             super_new.parameter_name = base_parameter_name
             if len(field_names) <= 1 and super_new.use_pk_exact:
                 super_new.parameter_name += f'__{super_new.field_pk}__exact'
+            super_new.title = title
+            super_new.form_field = generate_choice_field(label_by)
+            for attr, value in overrides.items():
+                if value is not None:
+                    setattr(super_new, attr, value)
             return super_new
 
     class NewFilter(AutocompleteFilter, metaclass=NewMetaFilter):
         """An autogenerated autocomplete filter class."""
 
-        def __init__(self, request: Any, params: dict[str, Any], model: Any, model_admin: Any) -> None:
-            self.rel_model = _get_rel_model(model, base_parameter_name)
-            self.form_field = generate_choice_field(label_by)
-            super().__init__(request, params, model, model_admin)
-            self.title = title
+        @classmethod
+        def get_rel_model(cls, model: Any) -> Any:
+            return _get_rel_model(model, base_parameter_name)
 
         def get_autocomplete_url(self, request: Any, model_admin: Any) -> str | None:
             if viewname:
-                return reverse(viewname)
+                return cached_reverse(viewname)
 
             # If viewname is not set (set to None or '' explicitly),
             # fallback to default Django admin `get_autocomplete_url`;
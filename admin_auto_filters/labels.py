@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from typing import Any
+
+from django.core.exceptions import EmptyResultSet
+
+from .routing import read_with_fallback
+
+REQUEST_ATTR = '_admin_auto_filters_label_resolvers'
+
+
+def _as_list(value: Any) -> list[Any]:
+    return list(value) if isinstance(value, list | tuple | set) else [value]
+
+
+class LabelResolver:
+    """
+    Selected objects of every autocomplete filter on one changelist, fetched together.
+
+    Built from the ModelAdmin's list filters and the changelist params before any filter
+    consumes them, it runs one query per (related model, to_field, database, label relations) on first use
+    instead of one query per filter widget. Filters then label the objects themselves,
+    so `label_from_instance`/`label_by` customizations keep working. Filters whose querysets
+    differ (another get_queryset_for_field() or manager) get their own query.
+    """
+
+    def __init__(self, request: Any, params: dict[str, Any], model: Any, model_admin: Any) -> None:
+        from .filters import AutocompleteFilterBase
+
+        self._specs: dict[tuple[Any, ...], Any] = {}
+        self._wanted: dict[tuple[Any, ...], set[str]] = defaultdict(set)
+        self._queried: dict[tuple[Any, ...], set[str]] = defaultdict(set)
+        self._fetched: dict[tuple[Any, ...], dict[str, Any]] = defaultdict(dict)
+        for list_filter in model_admin.get_list_filter(request):
+            if not (isinstance(list_filter, type) and issubclass(list_filter, AutocompleteFilterBase)):
+                continue
+            spec = list_filter.resolve_spec(model, model_admin)
+            raw = params.get(spec.parameter_name)
+            if isinstance(raw, list):
+                # Django 5.0+ passes every value of a repeated param; filters use the last one
+                raw = raw[-1] if raw else None
+            if raw:
+                self.add(spec, list_filter.coerce_values(spec, str(raw)))
+
+    @classmethod
+    def for_request(cls, request: Any, params: dict[str, Any], model: Any, model_admin: Any) -> LabelResolver:
+        """Return the resolver shared by all filters of `model_admin` during this request."""
+        resolvers = getattr(request, REQUEST_ATTR, None)
+        if resolvers is None:
+            resolvers = {}
+            setattr(request, REQUEST_ATTR, resolvers)
+        resolver = resolvers.get(model_admin)
+        if resolver is None:
+            resolver = resolvers[model_admin] = cls(request, params, model, model_admin)
+        return resolver
+
+    @staticmethod
+    def get_key(spec: Any) -> tuple[Any, ...]:
+        return (spec.related_model, spec.to_field_name, spec.using, spec.select_related, spec.prefetch_related)
+
+    @staticmethod
+    def get_queryset_key(queryset: Any) -> tuple[Any, ...]:
+        """Querysets compiling to the same SQL, with the same prefetches, share one fetch."""
+        try:
+            sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+        except EmptyResultSet:
+            # e.g. filter(pk__in=[]): nothing to share
+            return (id(queryset),)
+        return (queryset.model, queryset.db, sql, repr(params), repr(queryset._prefetch_related_lookups))
+
+    def add(self, spec: Any, values: Any) -> None:
+        key = self.get_key(spec)
+        self._specs.setdefault(key, spec)
+        self._wanted[key].update(str(value) for value in _as_list(values))
+
+    def get_objects(self, spec: Any, values: Any, queryset: Any) -> list[Any]:
+        """
+        Return the objects selected by `values`, in queryset order.
+        `queryset` is the filter's get_field_queryset(); filters with the same one share its fetch.
+        """
+        selected = {str(value) for value in _as_list(values)}
+        if not selected:
+            return []
+        key = self.get_key(spec)
+        # Values not collected up front (e.g. a filter outside get_list_filter()) cost one more query
+        self.add(spec, selected)
+        fetch_key = (key, self.get_queryset_key(queryset))
+        pending = self._wanted[key] - self._queried[fetch_key]
+        if pending:
+            self._fetch(key, fetch_key, pending, queryset)
+        return [obj for value, obj in self._fetched[fetch_key].items() if value in selected]
+
+    def _fetch(self, key: tuple[Any, ...], fetch_key: tuple[Any, ...], pending: set[str], queryset: Any) -> None:
+        fetched = self._fetched[fetch_key]
+        spec = self._specs[key]
+        to_field_name = key[1]
+        queryset = queryset.filter(**{f'{to_field_name}__in': pending})
+        for obj in read_with_fallback(lambda using: list(queryset if using == spec.using else queryset.using(using)), spec.using):
+            fetched[str(getattr(obj, to_field_name))] = obj
+        self._queried[fetch_key] |= pending
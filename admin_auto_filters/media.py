@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import inspect
+import threading
+import weakref
+from collections.abc import Callable
+from typing import Any
+
+from django.conf import settings
+from django.contrib.admin.widgets import get_select2_language
+from django.forms.widgets import Media
+
+
+def _get_media(obj: Any) -> Media:
+    return Media(media=getattr(obj, 'Media', None))
+
+
+class FilterMediaRegistry:
+    """
+    Media that autocomplete filters contribute to a ModelAdmin, merged once.
+
+    The first filter of a given (admin class, filter class, widget class, select2 language)
+    merges its media under a lock and, on first use of an admin class, wraps that class's
+    `media` property so it appends the merged result. Every later request is a set lookup.
+    Keys are held per filter class in a WeakKeyDictionary, so classes built per request don't pile up.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._seen: weakref.WeakKeyDictionary[type, set[tuple[Any, ...]]] = weakref.WeakKeyDictionary()
+        self._media: dict[tuple[type, str | None, bool], Media] = {}
+        self._patched: set[type] = set()
+
+    def register(self, model_admin: Any, filter_obj: Any, widget_cls: type | None, get_widget_media: Callable[[], Media]) -> None:
+        """Merge `filter_obj`'s media into `model_admin`'s; `get_widget_media` is only called the first time."""
+        admin_cls = type(model_admin)
+        # AutocompleteMixin picks its select2 i18n file from the active language
+        language = get_select2_language()
+        filter_cls = type(filter_obj)
+        key = (admin_cls, widget_cls, language, settings.DEBUG)
+        if key in self._seen.get(filter_cls, ()):
+            return
+        with self._lock:
+            if key in self._seen.get(filter_cls, ()):
+                return
+            from .filters import AutocompleteFilterBase
+
+            media_key = (admin_cls, language, settings.DEBUG)
+            media = self._media.get(media_key, Media())
+            # Same order the filters always used: widget assets, then the base and concrete filter assets
+            media = media + get_widget_media() + _get_media(AutocompleteFilterBase) + _get_media(filter_obj)
+            self._media[media_key] = media
+            self._patch(admin_cls)
+            self._seen.setdefault(filter_cls, set()).add(key)
+
+    def get_media(self, admin_cls: type, language: str | None = None) -> Media:
+        """Return the merged filter media registered for `admin_cls` (empty if none)."""
+        return self._media.get((admin_cls, language, settings.DEBUG), Media())
+
+    def clear(self) -> None:
+        """Forget merged media; admin classes keep their (now empty) wrapper."""
+        with self._lock:
+            self._seen.clear()
+            self._media.clear()
+
+    def _patch(self, admin_cls: type) -> None:
+        if admin_cls in self._patched:
+            return
+        # The unbound property from the MRO, so the admin's own Media keeps applying
+        original = inspect.getattr_static(admin_cls, 'media')
+        registry = self
+
+        def media(self: Any) -> Media:
+            return original.__get__(self, type(self)) + registry.get_media(admin_cls, get_select2_language())
+
+        admin_cls.media = property(media)  # type: ignore[attr-defined]
+        self._patched.add(admin_cls)
+
+
+filter_media = FilterMediaRegistry()
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from collections.abc import Iterable, Sequence
+from typing import Any
+
+from django.contrib.admin import ModelAdmin
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models.constants import LOOKUP_SEP
+from django.utils.text import smart_split, unescape_string_literal
+
+from .cache import add_change_listener, get_generation
+
+NGRAM_SIZE = 3
+
+
+def ngrams(text: str) -> set[str]:
+    return {text[i : i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def split_term(term: str) -> list[str]:
+    """Search bits as ModelAdmin.get_search_results() splits them, lowercased."""
+    bits = []
+    for bit in smart_split(term):
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        bits.append(bit.lower())
+    return bits
+
+
+def get_index_fields(model_admin: Any, search_fields: Sequence[str]) -> tuple[str, ...] | None:
+    """
+    The attnames to index for `search_fields`, or None if the index cannot give the same results as
+    get_search_results(): an overridden get_search_results(), '^', '=' or '@' prefixes, lookups other
+    than icontains, or fields that are relations or span them.
+    """
+    if type(model_admin).get_search_results is not ModelAdmin.get_search_results:
+        return None
+    opts = model_admin.model._meta
+    fields = []
+    for search_field in search_fields:
+        name = search_field.removesuffix(f'{LOOKUP_SEP}icontains')
+        if name.startswith(('^', '=', '@')) or LOOKUP_SEP in name:
+            return None
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if field.is_relation or not field.concrete:
+            return None
+        fields.append(field.attname)
+    return tuple(fields) or None
+
+
+class NgramIndex:
+    """
+    In-memory trigram index of some columns of one model, answering icontains searches.
+
+    Built on first search from one query, then updated from post_save/post_delete. It compares
+    the model's generation (admin_auto_filters.cache) with the one it last saw, so with a shared
+    cache, writes from other processes trigger a rebuild. Those processes move the generation
+    only for tracked models: AppConfig.ready() tracks the default admin site's autocomplete
+    targets (see views.track_autocomplete_targets()). Writes to another database, such as the
+    primary of an index read from a replica, also trigger a rebuild. Tables over `max_rows` are
+    not indexed.
+    """
+
+    def __init__(self, model: Any, fields: tuple[str, ...], using: str, max_rows: int) -> None:
+        self.model = model
+        self.fields = fields
+        self.using = using
+        self.max_rows = max_rows
+        self.generation: int | None = None
+        self.too_large = False
+        self._lock = threading.RLock()
+        self._documents: dict[Any, tuple[str, ...]] = {}
+        self._postings: dict[str, set[Any]] = defaultdict(set)
+
+    def search(self, term: str, max_matches: int) -> list[Any] | None:
+        """
+        Primary keys of the rows where every bit of `term` is contained in one of the fields
+        (case-insensitively), or None when the database should answer instead: the table is too
+        large or more than `max_matches` rows match.
+        """
+        with self._lock:
+            self._ensure_current()
+            if self.too_large:
+                return None
+            matches: set[Any] | None = None
+            for bit in split_term(term):
+                found = {pk for pk in self._candidates(bit) if any(bit in value for value in self._documents[pk])}
+                matches = found if matches is None else matches & found
+                if not matches:
+                    return []
+            if matches is None:
+                return None
+            if len(matches) > max_matches:
+                return None
+            return list(matches)
+
+    def update(self, instance: Any, deleted: bool, generation: int) -> None:
+        """Change listener: apply one save or delete, unless a write elsewhere was missed."""
+        with self._lock:
+            if self.generation is None or self.too_large:
+                return
+            if self.generation != generation - 1:
+                # Another writer moved the generation too: rebuild on the next search
+                self.generation = None
+                return
+            if instance._state.db != self.using:
+                # Written elsewhere (e.g. the primary of an index on a replica): rebuild on the next search
+                self.generation = None
+                return
+            self.generation = generation
+            self._remove(instance.pk)
+            if not deleted:
+                self._add(instance.pk, (getattr(instance, field) for field in self.fields))
+
+    def _candidates(self, bit: str) -> Iterable[Any]:
+        grams = ngrams(bit)
+        if not grams:
+            # Shorter than an n-gram: check every row
+            return list(self._documents)
+        postings = sorted((self._postings.get(gram, set()) for gram in grams), key=len)
+        return set.intersection(*postings)
+
+    def _ensure_current(self) -> None:
+        generation = get_generation(self.model)
+        if generation == self.generation:
+            return
+        self._documents.clear()
+        self._postings.clear()
+        queryset = self.model._base_manager.using(self.using)
+        self.too_large = queryset.count() > self.max_rows
+        if not self.too_large:
+            for pk, *values in queryset.values_list('pk', *self.fields).iterator(chunk_size=2000):
+                self._add(pk, values)
+        self.generation = generation
+
+    def _add(self, pk: Any, values: Iterable[Any]) -> None:
+        document = tuple('' if value is None else str(value).lower() for value in values)
+        self._documents[pk] = document
+        for value in document:
+            for gram in ngrams(value):
+                self._postings[gram].add(pk)
+
+    def _remove(self, pk: Any) -> None:
+        document = self._documents.pop(pk, None)
+        if document is None:
+            return
+        for value in document:
+            for gram in ngrams(value):
+                postings = self._postings.get(gram)
+                if postings is not None:
+                    postings.discard(pk)
+                    if not postings:
+                        del self._postings[gram]
+
+
+_indexes: dict[tuple[Any, tuple[str, ...], str], NgramIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(model: Any, fields: tuple[str, ...], using: str, max_rows: int) -> NgramIndex:
+    """Return the process-wide index of `fields` of `model` in database `using`."""
+    key = (model, fields, using)
+    index = _indexes.get(key)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(key)
+            if index is None:
+                index = _indexes[key] = NgramIndex(model, fields, using, max_rows)
+                add_change_listener(model, index.update)
+    return index
+
+
+def clear_ngram_indexes() -> None:
+    """Drop every index (they are rebuilt on the next search); call from tests."""
+    with _indexes_lock:
+        for index in _indexes.values():
+            with index._lock:
+                # Still a change listener; without a generation it ignores changes
+                index.generation = None
+                index._documents.clear()
+                index._postings.clear()
+        _indexes.clear()
@@ -0,0 +1,34 @@
+"""Routing of autocomplete reads to a database alias, e.g. a read replica."""
+
+from __future__ import annotations
+
+import logging
+from collections.abc import Callable
+from typing import TypeVar
+
+from django.db import DatabaseError
+
+from .conf import get_setting
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+def get_read_database(using: str | None) -> str | None:
+    """`using`, else ADMIN_AUTO_FILTERS_READ_DATABASE; None leaves the choice to the database routers."""
+    return get_setting('READ_DATABASE') if using is None else using
+
+
+def read_with_fallback(read: Callable[[str | None], T], using: str | None) -> T:
+    """
+    `read(using)`; when `using` is an alias, that raises a DatabaseError and
+    ADMIN_AUTO_FILTERS_READ_DATABASE_FALLBACK is on, `read(None)`, on the database the routers pick.
+    """
+    if using is None or not get_setting('READ_DATABASE_FALLBACK'):
+        return read(using)
+    try:
+        return read(using)
+    except DatabaseError:
+        logger.warning('Autocomplete read from database %r failed, retrying on the default one', using, exc_info=True)
+        return read(None)
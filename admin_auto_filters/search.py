@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import abc
+import sqlite3
+import threading
+from collections.abc import Sequence
+from typing import Any
+
+from asgiref.sync import sync_to_async
+from django.contrib.admin import ModelAdmin
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connections, models
+from django.db.models.constants import LOOKUP_SEP
+from django.db.models.expressions import RawSQL
+
+from .conf import get_setting
+from .ngram import get_index, get_index_fields, split_term
+
+# Search field lookups that every exact match satisfies, and those every prefix match satisfies
+_EXACT_SUBSUMING = {'icontains', 'istartswith', 'iexact'}
+_PREFIX_SUBSUMING = {'icontains', 'istartswith'}
+
+
+def is_indexed(field: Any) -> bool:
+    """Whether a B-tree index leads with `field` (primary key, unique, db_index or Meta.indexes)."""
+    if field.primary_key or field.unique or field.db_index:
+        return True
+    return any(index.fields and index.fields[0].lstrip('-') == field.name for index in field.model._meta.indexes)
+
+
+def get_tier_fields(model_admin: Any, search_fields: Sequence[str]) -> tuple[tuple[str, ...], tuple[str, ...]] | None:
+    """
+    The indexed text fields of `search_fields` to match exactly and by prefix before the full search,
+    or None without any. Tiers only use fields whose own lookup would match the same rows, so they
+    reorder get_search_results() matches without adding any; an overridden get_search_results() has none.
+    """
+    if type(model_admin).get_search_results is not ModelAdmin.get_search_results:
+        return None
+    opts = model_admin.model._meta
+    exact, prefix = [], []
+    for search_field in search_fields:
+        if search_field.startswith('^'):
+            name, lookup = search_field[1:], 'istartswith'
+        elif search_field.startswith('='):
+            name, lookup = search_field[1:], 'iexact'
+        else:
+            name, _, lookup = search_field.partition(LOOKUP_SEP)
+            lookup = lookup or 'icontains'
+        if lookup not in _EXACT_SUBSUMING:
+            continue
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            continue
+        if not isinstance(field, models.CharField | models.TextField) or not is_indexed(field):
+            continue
+        exact.append(field.name)
+        if lookup in _PREFIX_SUBSUMING:
+            prefix.append(field.name)
+    if not exact:
+        return None
+    return tuple(exact), tuple(prefix)
+
+
+class SearchBackend(abc.ABC):
+    """
+    How AutocompleteJsonView narrows the target model's queryset to a search term.
+
+    search() returns (queryset, may_have_duplicates), like ModelAdmin.get_search_results().
+    Select one with ADMIN_AUTO_FILTERS_SEARCH_BACKEND or AutocompleteJsonView.search_backend (a
+    class or its dotted path); for one filter, point its `viewname` at such a view subclass.
+    """
+
+    @abc.abstractmethod
+    def search(self, request: Any, model_admin: Any, queryset: Any, term: str) -> tuple[Any, bool]:
+        """Return (queryset narrowed to `term`, may_have_duplicates)."""
+
+    async def asearch(self, request: Any, model_admin: Any, queryset: Any, term: str) -> tuple[Any, bool]:
+        """search() for AsyncAutocompleteJsonView; runs it in a thread unless overridden."""
+        return await sync_to_async(self.search)(request, model_admin, queryset, term)
+
+
+class ModelAdminSearchBackend(SearchBackend):
+    """The default: ModelAdmin.get_search_results(), i.e. OR-ed icontains lookups over search_fields."""
+
+    def search(self, request: Any, model_admin: Any, queryset: Any, term: str) -> tuple[Any, bool]:
+        return model_admin.get_search_results(request, queryset, term)
+
+    async def asearch(self, request: Any, model_admin: Any, queryset: Any, term: str) -> tuple[Any, bool]:
+        # ModelAdmin's own get_search_results() only builds lookups; an override might query
+        if type(model_admin).get_search_results is ModelAdmin.get_search_results:
+            return self.search(request, model_admin, queryset, term)
+        return await super().asearch(request, model_admin, queryset, term)
+
+
+class NgramSearchBackend(ModelAdminSearchBackend):
+    """
+    Answers from the in-process n-gram index (admin_auto_filters.ngram) and fetches the matches by
+    pk; falls back to the database for what the index cannot handle.
+    """
+
+    def search(self, request: Any, model_admin: Any, queryset: Any, term: str) -> tuple[Any, bool]:
+        fields = get_index_fields(model_admin, model_admin.get_search_fields(request)) if term else None
+        if fields is not None:
+            index = get_index(queryset.model, fields, queryset.db, get_setting('NGRAM_INDEX_MAX_ROWS'))
+            pks = index.search(term, get_setting('NGRAM_INDEX_MAX_MATCHES'))
+            if pks is not None:
+                return queryset.filter(pk__in=pks), False
+        return super().search(request, model_admin, queryset, term)
+
+
+class SQLiteFTS5SearchBackend(ModelAdminSearchBackend):
+    """
+    Full-text search in an SQLite FTS5 table with the trigram tokenizer (SQLite 3.34+), which
+    matches case-insensitive substrings of 3+ characters like icontains.
+
+    On first use, it creates an external content FTS5 table over the search fields, populates it,
+    and adds triggers that keep it in sync with the model table. Falls back to get_search_results()
+    on other databases, for search fields get_index_fields() rejects, non-integer primary keys,
+    and words shorter than 3 characters.
+    """
+
+    table_prefix = 'admin_auto_filters_fts'
+    min_sqlite_version = (3, 34, 0)
+    _ready: set[tuple[str, str]] = set()
+    _lock = threading.Lock()
+
+    def search(self, request: Any, model_admin: Any, queryset: Any, term: str) -> tuple[Any, bool]:
+        bits = split_term(term)
+        fields = get_index_fields(model_admin, model_admin.get_search_fields(request)) if bits else None
+        if fields is None or not self.is_supported(queryset, bits):
+            return super().search(request, model_admin, queryset, term)
+        table = self.ensure_table(queryset.model, fields, queryset.db)
+        # Every word in any column: one quoted phrase per word, ANDed
+        match = ' AND '.join('"{}"'.format(bit.replace('"', '""')) for bit in bits)
+        quote = connections[queryset.db].ops.quote_name
+        sql = f'SELECT rowid FROM {quote(table)} WHERE {quote(table)} MATCH %s'  # noqa: S608 - our table name, quoted
+        rowids = RawSQL(sql, (match,))  # noqa: S611 - the term is a parameter
+        return queryset.filter(pk__in=rowids), False
+
+    def is_supported(self, queryset: Any, bits: list[str]) -> bool:
+        if connections[queryset.db].vendor != 'sqlite' or sqlite3.sqlite_version_info < self.min_sqlite_version:
+            return False
+        if queryset.model._meta.pk.get_internal_type() not in ('AutoField', 'BigAutoField', 'SmallAutoField', 'IntegerField'):
+            return False
+        return all(len(bit) >= 3 for bit in bits)
+
+    def get_table_name(self, model: Any, fields: tuple[str, ...]) -> str:
+        return '_'.join((self.table_prefix, model._meta.db_table, *fields))
+
+    def ensure_table(self, model: Any, fields: tuple[str, ...], using: str) -> str:
+        """
+        Create, populate and wire up the FTS table of `fields` unless it exists. SQLite cannot roll
+        back to a savepoint taken before a virtual table was created, so when searches may run in
+        such transactions, call this up front (e.g. from a RunPython migration).
+        """
+        table = self.get_table_name(model, fields)
+        key = (using, table)
+        if key in self._ready:
+            return table
+        with self._lock:
+            if key not in self._ready:
+                self.create_table(model, fields, using, table)
+                self._ready.add(key)
+        return table
+
+    def create_table(self, model: Any, fields: tuple[str, ...], using: str, table: str) -> None:
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        opts = model._meta
+        fts, source, pk = quote(table), quote(opts.db_table), quote(opts.pk.column)
+        columns = [quote(opts.get_field(field).column) for field in fields]
+        names = ', '.join(columns)
+        new_values = ', '.join(f'new.{column}' for column in columns)
+        old_values = ', '.join(f'old.{column}' for column in columns)
+        # Only identifiers of the model, quoted, go into these statements
+        insert_new = f'INSERT INTO {fts}(rowid, {names}) VALUES (new.{pk}, {new_values});'  # noqa: S608
+        delete_old = f"INSERT INTO {fts}({fts}, rowid, {names}) VALUES ('delete', old.{pk}, {old_values});"  # noqa: S608
+        statements = [
+            f"CREATE VIRTUAL TABLE {fts} USING fts5({names}, content={source}, content_rowid={pk}, tokenize='trigram')",
+            f'CREATE TRIGGER {quote(table + "_ai")} AFTER INSERT ON {source} BEGIN {insert_new} END',
+            f'CREATE TRIGGER {quote(table + "_ad")} AFTER DELETE ON {source} BEGIN {delete_old} END',
+            f'CREATE TRIGGER {quote(table + "_au")} AFTER UPDATE ON {source} BEGIN {delete_old} {insert_new} END',
+            f"INSERT INTO {fts}({fts}) VALUES ('rebuild')",  # noqa: S608
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [table])
+            if cursor.fetchone():
+                return
+            for statement in statements:
+                cursor.execute(statement)
@@ -10,8 +10,35 @@ django.jQuery(document).ready(function () {
               window.location.search = search_replace(param, val);
           }
       });
+  django.jQuery('#changelist-filter select[data-labels-url], #grp-filters select[data-labels-url]').each(
+      function () {
+          hydrate_labels(django.jQuery(this));
+      });
 });
 
+// Replace the placeholder labels of a filter's selected values (defer_labels) in one request
+function hydrate_labels($select) {
+    var ids = $select.find('option:selected').map(function () { return this.value; }).get().filter(Boolean);
+    if (ids.length == 0) { return; }
+    django.jQuery.ajax({
+        url: $select.data('labels-url'),
+        data: {
+            app_label: $select.data('app-label'),
+            model_name: $select.data('model-name'),
+            field_name: $select.data('field-name'),
+            ids: ids
+        },
+        traditional: true,
+        dataType: 'json'
+    }).done(function (data) {
+        django.jQuery.each(data.results, function (i, result) {
+            $select.find('option').filter(function () { return this.value === result.id; }).text(result.text);
+        });
+        // Namespaced: redraws Select2 without the handler above reloading the page
+        $select.trigger('change.select2');
+    });
+}
+
 function search_replace(name, value) {
     var new_search_hash = search_to_hash();
     if (value) {
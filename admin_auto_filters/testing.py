@@ -0,0 +1,55 @@
+"""Test helpers for projects using admin_auto_filters."""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Mapping, Sequence
+from typing import Any
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from .views import AutocompleteJsonView
+
+
+class QueryCountAssertionsMixin:
+    """TestCase mixin catching N+1 queries in autocomplete labels."""
+
+    def assertConstantQueries(self, func: Callable[[int], Any], sizes: Sequence[int] = (1, 10), using: str = DEFAULT_DB_ALIAS) -> None:  # noqa: N802
+        """Assert that `func(size)` runs the same number of queries for every size in `sizes`."""
+        counts = {}
+        for size in sizes:
+            with CaptureQueriesContext(connections[using]) as queries:
+                func(size)
+            counts[size] = len(queries)
+        if len(set(counts.values())) > 1:
+            self.fail(f'Query count depends on size (size: queries): {counts}')  # type: ignore[attr-defined]
+
+    def assertAutocompleteQueriesConstant(  # noqa: N802
+        self,
+        params: Mapping[str, str],
+        user: Any,
+        admin_site: Any,
+        view_cls: type[AutocompleteJsonView] = AutocompleteJsonView,
+        sizes: Sequence[int] = (1, 10),
+        using: str = DEFAULT_DB_ALIAS,
+    ) -> None:
+        """
+        Assert that an autocomplete response costs the same queries for every page size, e.g.
+            self.assertAutocompleteQueriesConstant(
+                {'app_label': 'shop', 'model_name': 'order', 'field_name': 'customer', 'term': ''},
+                user=self.superuser,
+                admin_site=admin.site,
+            )
+        """
+
+        def get_page(size: int) -> None:
+            request = RequestFactory().get('/', params)
+            request.user = user
+            sized_view_cls: Any = type(view_cls.__name__, (view_cls,), {'paginate_by': size})
+            view = sized_view_cls.as_view(admin_site=admin_site)
+            response = view(request)
+            if response.status_code != 200:
+                self.fail(f'Autocomplete response status {response.status_code}')  # type: ignore[attr-defined]
+
+        self.assertConstantQueries(get_page, sizes, using)
@@ -1,8 +1,57 @@
 from __future__ import annotations
 
-from typing import Any
+import copy
+import hashlib
+import time
+from collections.abc import Callable, Sequence
+from functools import partial, wraps
+from typing import Any, TypeVar
 
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.contrib.admin import ModelAdmin
+from django.contrib.admin.options import IncorrectLookupParameters
 from django.contrib.admin.views.autocomplete import AutocompleteJsonView as Base
+from django.core import signing
+from django.core.exceptions import BadRequest, ImproperlyConfigured, PermissionDenied, SuspiciousOperation
+from django.db import DatabaseError
+from django.db.models import Q
+from django.http import Http404, HttpResponse, JsonResponse, QueryDict
+from django.urls import reverse
+from django.utils.cache import add_never_cache_headers, get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import quote_etag, urlencode
+from django.utils.module_loading import import_string
+from django.utils.text import smart_split, unescape_string_literal
+
+from .budget import QueryBudget
+from .cache import KEY_PREFIX, SingleFlight, get_cache, get_generation, track_model
+from .changelist import get_changelist_queryset
+from .conf import get_setting
+from .filters import (
+    FACETS_QUERY_PARAM,
+    FACETS_SALT,
+    MIN_TERM_LENGTH_QUERY_PARAM,
+    QUERY_TIMEOUT_QUERY_PARAM,
+    clean_values,
+    count_facets,
+    format_facet_count,
+)
+from .routing import get_read_database, read_with_fallback
+from .search import SearchBackend, get_tier_fields
+
+# Query parameter with the opaque cursor of a keyset page (see AutocompleteJsonView.get_keyset_page())
+CURSOR_QUERY_PARAM = 'cursor'
+CURSOR_SALT = 'admin_auto_filters.cursor'
+
+# ETag modes (see AutocompleteJsonView.etags)
+ETAGS_PAYLOAD = 'payload'
+ETAGS_GENERATION = 'generation'
+ETAGS_MODES: tuple[str, ...] = (ETAGS_PAYLOAD, ETAGS_GENERATION)
+
+T = TypeVar('T')
+
+# Concurrent identical requests of this process (see AutocompleteJsonView.coalesce_requests)
+_flights = SingleFlight()
 
 
 class AutocompleteJsonView(Base):
@@ -10,6 +59,487 @@ class AutocompleteJsonView(Base):
 
     model_admin: Any = None
     source_field: Any = None
+    # Response cache; None uses ADMIN_AUTO_FILTERS_RESULTS_CACHE and ADMIN_AUTO_FILTERS_RESULTS_CACHE_TIMEOUT
+    cache_results: bool | None = None
+    results_cache_timeout: int | None = None
+    # Keyset pagination; None uses ADMIN_AUTO_FILTERS_KEYSET_PAGINATION
+    keyset_pagination: bool | None = None
+    # Projection mode: fetch only these columns and build labels from them (see serialize_row())
+    label_fields: Sequence[str] = ()
+    label_format: str | None = None
+    # Relations display_text() reads; None uses the target ModelAdmin's attributes of the same name
+    label_select_related: Sequence[str] | None = None
+    label_prefetch_related: Sequence[str] | None = None
+    # SearchBackend class or dotted path; None uses ADMIN_AUTO_FILTERS_SEARCH_BACKEND
+    search_backend: type[SearchBackend] | str | None = None
+    # Exact and prefix matches on indexed fields before the full search; None uses ADMIN_AUTO_FILTERS_TIERED_SEARCH
+    tiered_search: bool | None = None
+    # Terms shorter than this are not searched: they get the first `short_term_results` results
+    # containing them, or an empty page. None uses ADMIN_AUTO_FILTERS_MIN_TERM_LENGTH/_SHORT_TERM_RESULTS
+    min_term_length: int | None = None
+    short_term_results: int | None = None
+    # Concurrent identical requests share one computation; None uses ADMIN_AUTO_FILTERS_COALESCE_REQUESTS
+    coalesce_requests: bool | None = None
+    # Validators for conditional GETs: 'payload' or 'generation' (see get_etag_mode()), and the
+    # browser cache lifetime; None uses ADMIN_AUTO_FILTERS_ETAGS and ADMIN_AUTO_FILTERS_BROWSER_CACHE_MAX_AGE
+    etags: str | None = None
+    browser_cache_max_age: int | None = None
+    # Database alias of the view's reads; None uses ADMIN_AUTO_FILTERS_READ_DATABASE
+    using: str | None = None
+    # Alias of the reads in progress (see read())
+    db: str | None = None
+    # Seconds the result queries may take before they are cancelled and the rows fetched so far
+    # returned (see fetch()); None uses ADMIN_AUTO_FILTERS_QUERY_TIMEOUT
+    query_timeout: float | None = None
+    budget_chunk_size = 20
+    deadline: float | None = None
+    truncated = False
+
+    def get(self, request: Any, *args: Any, **kwargs: Any) -> HttpResponse:
+        to_field_name = self.check_request(request)
+
+        etag = None
+        if self.get_etag_mode(request) == ETAGS_GENERATION:
+            etag = self.make_etag(self.get_flight_key(request, to_field_name))
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return self.patch_cache_headers(not_modified, etag)
+
+        payload = self.get_cached_payload(request, to_field_name)
+        response = JsonResponse(payload)
+        if payload.get('truncated'):
+            # Partial results: no validator, and no reuse by the browser
+            return self.patch_cache_headers(response, None, cacheable=False)
+        if self.get_etag_mode(request) == ETAGS_PAYLOAD:
+            etag = self.make_etag(hashlib.sha256(response.content).hexdigest())
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return self.patch_cache_headers(not_modified, etag)
+        return self.patch_cache_headers(response, etag)
+
+    def get_cached_payload(self, request: Any, to_field_name: str) -> dict[str, Any]:
+        """get_payload(), through the response cache and request coalescing when they are on."""
+        compute = partial(self.read, partial(self.get_payload, to_field_name))
+        if self.use_coalescing():
+            compute = partial(_flights.do, self.get_flight_key(request, to_field_name), compute)
+
+        if not self.use_results_cache(request):
+            return compute()
+
+        cache = get_cache()
+        key = self.get_results_cache_key(request, to_field_name)
+        payload = cache.get(key)
+        if payload is None:
+            payload = compute()
+            timeout = self.results_cache_timeout
+            if not payload.get('truncated'):
+                cache.set(key, payload, get_setting('RESULTS_CACHE_TIMEOUT') if timeout is None else timeout)
+        return payload
+
+    def read(self, func: Callable[[], T]) -> T:
+        """
+        func() with the view's queries on get_read_database(), then once more on the routers'
+        database if that fails and ADMIN_AUTO_FILTERS_READ_DATABASE_FALLBACK is on.
+        """
+
+        def read_on(using: str | None) -> T:
+            self.db = using
+            return func()
+
+        return read_with_fallback(read_on, self.get_read_database())
+
+    def get_read_database(self) -> str | None:
+        return get_read_database(self.using)
+
+    def get_etag_mode(self, request: Any) -> str | None:
+        """
+        'payload': a hash of the response body, which saves the transfer but not the search.
+        'generation': derived from the results cache key, whose target model generation moves when
+        a row is saved or deleted in any process tracking it (see track_autocomplete_targets()),
+        so a 304 costs no query; stale after writes without signals, like the response cache.
+        Facet counts always use 'payload'. None: no ETag.
+        """
+        mode = get_setting('ETAGS') if self.etags is None else self.etags
+        if mode is not None and mode not in ETAGS_MODES:
+            raise ImproperlyConfigured(f'Unknown etags mode {mode!r}; expected one of {", ".join(ETAGS_MODES)}.')
+        if mode == ETAGS_GENERATION and FACETS_QUERY_PARAM in request.GET:
+            return ETAGS_PAYLOAD
+        return mode
+
+    @staticmethod
+    def make_etag(digest: str) -> str:
+        return quote_etag(digest[:32])
+
+    def patch_cache_headers(self, response: HttpResponse, etag: str | None, cacheable: bool = True) -> HttpResponse:
+        """
+        Private caching for `browser_cache_max_age` seconds, else revalidation on every use when
+        there is an ETag, else (and unless `cacheable`) the admin's usual never_cache headers.
+        """
+        max_age = get_setting('BROWSER_CACHE_MAX_AGE') if self.browser_cache_max_age is None else self.browser_cache_max_age
+        if not cacheable:
+            max_age = 0
+        if etag is not None:
+            response.headers['ETag'] = etag
+        if max_age:
+            patch_cache_control(response, private=True, max_age=max_age)
+        elif etag is not None:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            add_never_cache_headers(response)
+        # Responses depend on the logged-in user
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    def check_request(self, request: Any) -> str:
+        """Validate the request's source field and the user's permission; return the to_field name."""
+        self.term, self.model_admin, self.source_field, to_field_name = self.process_request(request)
+
+        if not self.has_perm(request):
+            raise PermissionDenied
+        return to_field_name
+
+    def use_results_cache(self, request: Any) -> bool:
+        enabled = get_setting('RESULTS_CACHE') if self.cache_results is None else self.cache_results
+        # Facet counts depend on the changelist model's rows, which the key does not track
+        return bool(enabled) and FACETS_QUERY_PARAM not in request.GET
+
+    def use_coalescing(self) -> bool:
+        return bool(get_setting('COALESCE_REQUESTS') if self.coalesce_requests is None else self.coalesce_requests)
+
+    def get_flight_key(self, request: Any, to_field_name: str) -> str:
+        """Key of the requests get() coalesces: those with the same results cache key and facet context."""
+        return self.make_cache_key('flight', (self.get_results_cache_key(request, to_field_name), request.GET.get(FACETS_QUERY_PARAM, '')))
+
+    def get_results_cache_key(self, request: Any, to_field_name: str) -> str:
+        """
+        Cache key of a response: admin site, source field, term, page and permission scope, plus
+        the target model's generation so saving or deleting one of its rows invalidates it.
+        """
+        model = self.model_admin.model
+        track_model(model)
+        parts = (
+            f'{type(self).__module__}.{type(self).__qualname__}',
+            getattr(self.admin_site, 'name', ''),
+            model._meta.label_lower,
+            request.GET.get('app_label', ''),
+            request.GET.get('model_name', ''),
+            request.GET.get('field_name', ''),
+            to_field_name,
+            self.term,
+            request.GET.get(self.page_kwarg, '1'),
+            request.GET.get(CURSOR_QUERY_PARAM, ''),
+            request.GET.get(MIN_TERM_LENGTH_QUERY_PARAM, ''),
+            request.GET.get(QUERY_TIMEOUT_QUERY_PARAM, ''),
+            self.get_cache_scope(request),
+            str(get_generation(model)),
+        )
+        return self.make_cache_key('results', parts)
+
+    def get_top_results_cache_key(self, limit: int) -> str:
+        """Cache key of the first `limit` unsearched results, versioned like get_results_cache_key()."""
+        request = self.request
+        model = self.model_admin.model
+        track_model(model)
+        parts = (
+            f'{type(self).__module__}.{type(self).__qualname__}',
+            getattr(self.admin_site, 'name', ''),
+            model._meta.label_lower,
+            request.GET.get('app_label', ''),
+            request.GET.get('model_name', ''),
+            request.GET.get('field_name', ''),
+            self.to_field_name,
+            str(limit),
+            self.get_cache_scope(request),
+            str(get_generation(model)),
+        )
+        return self.make_cache_key('top', parts)
+
+    def get_cursor_cache_key(self, page: int) -> str:
+        """Cache key of the cursor that starts keyset page `page` of the current search."""
+        request = self.request
+        parts = (
+            getattr(self.admin_site, 'name', ''),
+            request.GET.get('app_label', ''),
+            request.GET.get('model_name', ''),
+            request.GET.get('field_name', ''),
+            self.term,
+            str(page),
+            self.get_cache_scope(request),
+        )
+        return self.make_cache_key('cursor', parts)
+
+    @staticmethod
+    def make_cache_key(kind: str, parts: tuple[str, ...]) -> str:
+        digest = hashlib.sha256('\x1f'.join(parts).encode()).hexdigest()
+        return f'{KEY_PREFIX}:{kind}:{digest}'
+
+    def get_cache_scope(self, request: Any) -> str:
+        """
+        Part of the cache key shared by users who get the same results: superusers, or users with
+        the same permissions. Override it when `get_queryset()` or `get_search_results()` of the
+        target ModelAdmin depend on the user in other ways (e.g. return the user's pk).
+        """
+        user = request.user
+        if user.is_superuser:
+            return 'superuser'
+        permissions = ','.join(sorted(user.get_all_permissions()))
+        return hashlib.sha256(permissions.encode()).hexdigest()
+
+    def get_payload(self, to_field_name: str) -> dict[str, Any]:
+        """The JSON body: `{results: [{id, text}], pagination: {more}}`, plus `truncated: true` when out of time."""
+        self.to_field_name = to_field_name
+        self.truncated = False
+        timeout = self.get_query_timeout()
+        self.deadline = time.monotonic() + timeout if timeout else None
+        if len(self.term.strip()) < self.get_min_term_length():
+            term = self.term.strip().lower()
+            results = [dict(result) for result in self.get_top_results() if term in result['text'].lower()]
+            values = [result['id'] for result in results]
+            pagination: dict[str, Any] = {'more': False}
+        else:
+            objects, pagination = self.get_page()
+            results, values = self.serialize_objects(objects)
+        facets = self.get_facet_counts(values)
+        if facets is not None:
+            counts, truncated = facets
+            for result in results:
+                result['text'] = format_facet_count(result['text'], counts.get(result['id'], 0), truncated)
+        payload: dict[str, Any] = {
+            'results': results,
+            'pagination': pagination,
+        }
+        if self.truncated:
+            pagination['more'] = False
+            payload['truncated'] = True
+        return payload
+
+    def get_page(self) -> tuple[list[Any], dict[str, Any]]:
+        """The objects (or projection rows) of the requested page of search results, and its pagination."""
+        tiers = self.get_search_tiers()
+        if tiers:
+            return self.get_tiered_page(tiers)
+        if self.use_keyset_pagination():
+            return self.get_keyset_page()
+        if self.deadline is not None:
+            return self.get_offset_page()
+        self.object_list = self.project(self.add_label_relations(self.get_queryset()))
+        context = self.get_context_data()
+        return list(context['object_list']), {'more': context['page_obj'].has_next()}
+
+    def get_offset_page(self) -> tuple[list[Any], dict[str, Any]]:
+        """One page of `limit + 1` rows at an OFFSET through fetch(), without COUNT (with a query timeout)."""
+        queryset = self.project(self.add_label_relations(self.get_queryset()))
+        limit = self.get_paginate_by(queryset) or 20
+        page = self.get_page_number()
+        start = (page - 1) * limit
+        objects = self.fetch(queryset[start : start + limit + 1])
+        if page > 1 and not objects and not self.truncated:
+            # As Paginator, for an empty page past the first
+            raise Http404
+        return objects[:limit], {'more': len(objects) > limit}
+
+    def get_query_timeout(self) -> float | None:
+        """
+        Seconds the result queries may take: `query_timeout` (else ADMIN_AUTO_FILTERS_QUERY_TIMEOUT),
+        or the filter's own from the `query_timeout` URL parameter when shorter. None: no budget.
+        """
+        timeouts = [get_setting('QUERY_TIMEOUT') if self.query_timeout is None else self.query_timeout]
+        try:
+            timeouts.append(float(self.request.GET.get(QUERY_TIMEOUT_QUERY_PARAM, '')))
+        except ValueError:
+            pass
+        timeouts = [timeout for timeout in timeouts if timeout and timeout > 0]
+        return min(timeouts) if timeouts else None
+
+    def fetch(self, queryset: Any) -> list[Any]:
+        """
+        list(queryset); within a query timeout, the rows fetched before it ran out, in chunks of
+        `budget_chunk_size`, setting `truncated` when it did.
+        """
+        if self.deadline is None:
+            return list(queryset)
+        budget = QueryBudget(queryset.db, self.deadline)
+        if not budget.supported:
+            return list(queryset)
+        rows: list[Any] = []
+        if time.monotonic() >= self.deadline:
+            self.truncated = True
+            return rows
+        try:
+            with budget:
+                for row in queryset.iterator(chunk_size=self.budget_chunk_size):
+                    rows.append(row)
+        except DatabaseError as e:
+            if not budget.is_timeout(e):
+                raise
+            self.truncated = True
+        return rows
+
+    def serialize_objects(self, objects: list[Any]) -> tuple[list[dict[str, str]], list[Any]]:
+        """Results of a page of instances (or projection rows), and their to_field values."""
+        if self.label_fields:
+            return [self.serialize_row(row) for row in objects], [row[1] for row in objects]
+        to_field_name = self.to_field_name
+        return [self.serialize_result(obj, to_field_name) for obj in objects], [getattr(obj, to_field_name) for obj in objects]
+
+    def get_min_term_length(self) -> int:
+        """
+        `min_term_length` (else ADMIN_AUTO_FILTERS_MIN_TERM_LENGTH), or the filter's own from the
+        `min_term_length` URL parameter when larger: the parameter can raise the minimum, not lower it.
+        """
+        length = get_setting('MIN_TERM_LENGTH') if self.min_term_length is None else self.min_term_length
+        try:
+            requested = int(self.request.GET.get(MIN_TERM_LENGTH_QUERY_PARAM, 0))
+        except ValueError:
+            requested = 0
+        return max(length, requested)
+
+    def get_top_results(self) -> list[dict[str, str]]:
+        """The first `short_term_results` results without a search, cached; short terms are matched against their text."""
+        limit = get_setting('SHORT_TERM_RESULTS') if self.short_term_results is None else self.short_term_results
+        if not limit:
+            return []
+        cache = get_cache()
+        key = self.get_top_results_cache_key(limit)
+        results = cache.get(key)
+        if results is None:
+            queryset = self.get_choices_queryset()
+            if not queryset.ordered:
+                queryset = queryset.order_by('pk')
+            results, _ = self.serialize_objects(list(self.project(self.add_label_relations(queryset))[:limit]))
+            timeout = self.results_cache_timeout
+            cache.set(key, results, get_setting('RESULTS_CACHE_TIMEOUT') if timeout is None else timeout)
+        return results
+
+    def use_keyset_pagination(self) -> bool:
+        return bool(get_setting('KEYSET_PAGINATION') if self.keyset_pagination is None else self.keyset_pagination)
+
+    def get_keyset_page(self) -> tuple[list[Any], dict[str, Any]]:
+        """
+        One page of results ordered by primary key, without COUNT: `limit + 1` rows after the
+        cursor tell whether there is a next page. The response carries the next page's cursor,
+        which is also remembered for Select2, that only sends page numbers. A page without a
+        known cursor falls back to OFFSET.
+        """
+        queryset = self.project(self.add_label_relations(self.get_queryset()).order_by('pk'))
+        limit = self.get_paginate_by(queryset) or 20
+        page = self.get_page_number()
+        after = self.get_cursor(page)
+        if after is not None:
+            queryset = queryset.filter(pk__gt=after)
+        elif page > 1:
+            queryset = queryset[(page - 1) * limit :]
+        objects = self.fetch(queryset[: limit + 1])
+        more = len(objects) > limit and not self.truncated
+        objects = objects[:limit]
+        cursor = None
+        if more:
+            last = objects[-1]
+            cursor = signing.dumps(str(last[0] if self.label_fields else last.pk), salt=CURSOR_SALT)
+            get_cache().set(self.get_cursor_cache_key(page + 1), cursor, get_setting('KEYSET_CURSOR_TIMEOUT'))
+        return objects, {'more': more, 'cursor': cursor}
+
+    def get_search_tiers(self) -> list[Q]:
+        """
+        Conditions tried in order before the full search: the term equal to, then starting with,
+        one of the indexed search fields (see search.get_tier_fields()). Empty when tiered search is
+        off, the term is not a single word, or no search field qualifies.
+        """
+        enabled = get_setting('TIERED_SEARCH') if self.tiered_search is None else self.tiered_search
+        bits = list(smart_split(self.term)) if enabled else []
+        if len(bits) != 1:
+            return []
+        bit = bits[0]
+        if bit.startswith(('"', "'")) and bit[0] == bit[-1]:
+            bit = unescape_string_literal(bit)
+        fields = get_tier_fields(self.model_admin, self.model_admin.get_search_fields(self.request))
+        if fields is None:
+            return []
+        exact, prefix = fields
+        tiers = [Q.create([(f'{name}__exact', bit) for name in exact], connector=Q.OR)]
+        if prefix:
+            tiers.append(Q.create([(f'{name}__istartswith', bit) for name in prefix], connector=Q.OR))
+        return tiers
+
+    def get_tiered_page(self, tiers: list[Q]) -> tuple[list[Any], dict[str, Any]]:
+        """
+        One page of results, tier by tier: each tier adds the primary keys of its matches not found
+        yet, and the full search only runs while fewer than the rows up to this page, plus one to
+        tell whether there is a next page, were found. No COUNT; later pages refetch earlier ones.
+        """
+        queryset = self.get_choices_queryset()
+        ordering = self.get_tier_ordering(queryset)
+        queryset = queryset.order_by(*ordering)
+        limit = self.get_paginate_by(queryset) or 20
+        page = self.get_page_number()
+        needed = page * limit + 1
+        pks: list[Any] = []
+        for tier in [*(queryset.filter(tier) for tier in tiers), self.get_queryset().order_by(*ordering)]:
+            if pks:
+                tier = tier.exclude(pk__in=pks)
+            pks.extend(self.fetch(tier.values_list('pk', flat=True)[: needed - len(pks)]))
+            if len(pks) >= needed or self.truncated:
+                break
+        page_pks = pks[(page - 1) * limit : page * limit]
+        rows = self.project(self.add_label_relations(queryset.filter(pk__in=page_pks)))
+        by_pk = {row[0] if self.label_fields else row.pk: row for row in rows}
+        return [by_pk[pk] for pk in page_pks if pk in by_pk], {'more': len(pks) > page * limit}
+
+    def get_tier_ordering(self, queryset: Any) -> tuple[Any, ...]:
+        """
+        The order of every tier, the full search included: the queryset's (the admin's or the
+        model's) ordering, then pk, so the pages that refetch earlier tiers see them in the same order.
+        """
+        ordering = tuple(queryset.query.order_by)
+        if not ordering and queryset.query.default_ordering:
+            ordering = tuple(queryset.model._meta.ordering)
+        return ordering if {'pk', '-pk'} & set(ordering) else (*ordering, 'pk')
+
+    def get_page_number(self) -> int:
+        try:
+            return max(int(self.request.GET.get(self.page_kwarg, 1)), 1)
+        except ValueError:
+            return 1
+
+    def get_cursor(self, page: int) -> str | None:
+        """The primary key page `page` starts after: from the `cursor` parameter, else remembered for Select2."""
+        token = self.request.GET.get(CURSOR_QUERY_PARAM)
+        if not token and page > 1:
+            token = get_cache().get(self.get_cursor_cache_key(page))
+        if not token:
+            return None
+        try:
+            return signing.loads(token, salt=CURSOR_SALT)
+        except signing.BadSignature:
+            return None
+
+    def get_facet_counts(self, values: list[Any]) -> tuple[dict[str, int], bool] | None:
+        """
+        Counts of the changelist rows per result, from the signed context filters add to their
+        autocomplete URL when facets are shown: the rows of the changelist queryset (every other
+        list filter, the search box) without the filter itself, like the selected values' counts.
+        None when there is no (valid) context or the user can't view the changelist.
+        """
+        token = self.request.GET.get(FACETS_QUERY_PARAM)
+        if not token or not values:
+            return None
+        try:
+            context = signing.loads(token, salt=FACETS_SALT)
+            model = apps.get_model(context['model'])
+        except (signing.BadSignature, LookupError, KeyError, ValueError):
+            return None
+        model_admin = getattr(self.admin_site, '_registry', {}).get(model)
+        if model_admin is None or not model_admin.has_view_permission(self.request):
+            return None
+        changelist_request = copy.copy(self.request)
+        changelist_request.GET = QueryDict(urlencode(context['params'], doseq=True))
+        try:
+            queryset = get_changelist_queryset(model_admin, changelist_request, context['exclude'])
+        except (IncorrectLookupParameters, SuspiciousOperation):
+            return None
+        if self.db is not None:
+            queryset = queryset.using(self.db)
+        return count_facets(queryset, context['path'], values, max_rows=context['max_rows'])
 
     @staticmethod
     def display_text(obj: Any) -> str:
@@ -21,12 +551,251 @@ class AutocompleteJsonView(Base):
     def serialize_result(self, obj: Any, to_field_name: str) -> dict[str, str]:
         return {'id': str(getattr(obj, to_field_name)), 'text': self.display_text(obj)}
 
-    def get_queryset(self) -> Any:
-        """Return queryset based on ModelAdmin.get_search_results()."""
+    def add_label_relations(self, queryset: Any) -> Any:
+        """
+        Apply `label_select_related`/`label_prefetch_related` (else the target ModelAdmin's) so
+        display_text() reading related objects costs no query per result. Unused in projection mode.
+        """
+        if self.label_fields:
+            return queryset
+        select_related = self.label_select_related
+        if select_related is None:
+            select_related = getattr(self.model_admin, 'label_select_related', None)
+        prefetch_related = self.label_prefetch_related
+        if prefetch_related is None:
+            prefetch_related = getattr(self.model_admin, 'label_prefetch_related', None)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+    def project(self, queryset: Any) -> Any:
+        """In projection mode, rows of (pk, to_field value, *label_fields) instead of model instances."""
+        if not self.label_fields:
+            return queryset
+        return queryset.values_list('pk', self.to_field_name, *self.label_fields)
+
+    def serialize_row(self, row: tuple[Any, ...]) -> dict[str, str]:
+        """Projection mode counterpart of serialize_result()."""
+        return {'id': str(row[1]), 'text': self.format_label(row[2:])}
+
+    def format_label(self, values: Sequence[Any]) -> str:
+        """
+        Label from the `label_fields` values: `label_format` with the values as positional and
+        keyword arguments (e.g. '{name} ({device__slug})'), else the values joined by spaces.
+        """
+        if self.label_format is None:
+            return ' '.join(str(value) for value in values)
+        return self.label_format.format(*values, **dict(zip(self.label_fields, values, strict=True)))
+
+    def get_search_backend(self) -> SearchBackend:
+        backend = get_setting('SEARCH_BACKEND') if self.search_backend is None else self.search_backend
+        if isinstance(backend, str):
+            backend = import_string(backend)
+        return backend()
+
+    def get_choices_queryset(self) -> Any:
+        """The target ModelAdmin's queryset narrowed by the source field's limit_choices_to, before searching."""
         qs = self.model_admin.get_queryset(self.request)
+        if self.db is not None:
+            qs = qs.using(self.db)
         if hasattr(self.source_field, 'get_limit_choices_to'):
             qs = qs.complex_filter(self.source_field.get_limit_choices_to())
-        qs, search_use_distinct = self.model_admin.get_search_results(self.request, qs, self.term)
+        return qs
+
+    def get_queryset(self) -> Any:
+        """Return queryset based on the search backend (by default ModelAdmin.get_search_results())."""
+        qs = self.get_choices_queryset()
+        qs, search_use_distinct = self.get_search_backend().search(self.request, self.model_admin, qs, self.term)
+        if search_use_distinct:
+            qs = qs.distinct()
+        return qs
+
+
+class AutocompleteLabelsView(AutocompleteJsonView):
+    """
+    Labels of already selected values, for filters that render placeholders (`defer_labels`):
+    `?app_label=...&model_name=...&field_name=...&ids=1&ids=2` returns `{results: [{id, text}]}` in
+    the order of `ids`, from one query, with the autocomplete endpoint's permission checks.
+    """
+
+    max_ids = 100
+
+    def get(self, request: Any, *args: Any, **kwargs: Any) -> HttpResponse:
+        self.to_field_name = self.check_request(request)
+        labels = self.read(partial(self.get_labels, self.get_ids(request)))
+        return self.patch_cache_headers(JsonResponse({'results': labels}), None)
+
+    def get_ids(self, request: Any) -> list[Any]:
+        """The `ids` parameters valid for the to_field, de-duplicated and capped at `max_ids` (see clean_values())."""
+        field = self.model_admin.model._meta.get_field(self.to_field_name)
+        return clean_values(field, request.GET.getlist('ids'), self.max_ids)
+
+    def get_labels(self, ids: list[Any]) -> list[dict[str, str]]:
+        if not ids:
+            return []
+        queryset = self.get_choices_queryset().filter(**{f'{self.to_field_name}__in': ids})
+        results, _ = self.serialize_objects(list(self.project(self.add_label_relations(queryset))))
+        by_id = {result['id']: result for result in results}
+        return [by_id[str(value)] for value in ids if str(value) in by_id]
+
+
+class AutocompleteBatchView(AutocompleteJsonView):
+    """
+    Several autocomplete requests in one round trip: each `q` parameter (GET, or POST form data) is
+    the query string of one AutocompleteJsonView request, e.g.
+    `q=app_label%3Dfoods%26model_name%3Dfood%26field_name%3Dperson%26term%3Dal`. Returns
+    `{results: [...]}` with each request's payload, or `{error: status}` when it is denied or
+    not found, in the order of the `q` parameters.
+
+    The queries run one after another in this request. Each source field is validated, and the
+    user's permission on each target ModelAdmin checked, once per batch.
+    """
+
+    query_param = 'q'
+    max_queries = 20
+    # The view that answers each query; get_cached_payload() is called on a fresh instance per query
+    query_view_class: type[AutocompleteJsonView] = AutocompleteJsonView
+
+    def get(self, request: Any, *args: Any, **kwargs: Any) -> HttpResponse:
+        return self.get_batch_response(request, request.GET.getlist(self.query_param))
+
+    def post(self, request: Any, *args: Any, **kwargs: Any) -> HttpResponse:
+        return self.get_batch_response(request, request.POST.getlist(self.query_param))
+
+    def get_batch_response(self, request: Any, queries: list[str]) -> HttpResponse:
+        if len(queries) > self.max_queries:
+            raise BadRequest(f'At most {self.max_queries} queries per batch.')
+        targets: dict[tuple[str, ...], tuple[Any, Any, str] | int] = {}
+        results = [self.get_query_result(request, query, targets) for query in queries]
+        return self.patch_cache_headers(JsonResponse({'results': results}), None)
+
+    def get_query_result(self, request: Any, query: str, targets: dict[tuple[str, ...], tuple[Any, Any, str] | int]) -> dict[str, Any]:
+        """The payload of one query, resolving its target through `targets`, shared by the batch."""
+        query_request = copy.copy(request)
+        query_request.method = 'GET'
+        query_request.GET = QueryDict(query)
+        view = self.query_view_class(admin_site=self.admin_site)
+        view.setup(query_request)
+
+        params = query_request.GET
+        key = (params.get('app_label', ''), params.get('model_name', ''), params.get('field_name', ''))
+        target = targets.get(key)
+        if target is None:
+            try:
+                to_field_name = view.check_request(query_request)
+            except PermissionDenied:
+                target = 403
+            except Http404:
+                target = 404
+            else:
+                target = (view.model_admin, view.source_field, to_field_name)
+            targets[key] = target
+        else:
+            view.term = params.get('term', '')
+        if isinstance(target, int):
+            return {'error': target}
+        view.model_admin, view.source_field, to_field_name = target
+        try:
+            return view.get_cached_payload(query_request, to_field_name)
+        except Http404:
+            # An empty page past the first
+            return {'error': 404}
+
+
+class AsyncAutocompleteJsonView(AutocompleteJsonView):
+    """
+    AutocompleteJsonView for ASGI: searches and pages with the async ORM instead of holding a
+    thread for the whole request. Pages are `limit + 1` rows at an OFFSET, without COUNT.
+
+    Request checks run in one sync_to_async() call, and so does serializing a page, as
+    display_text() may read relations (projection mode serializes rows on the event loop).
+    Requests using the response cache, coalescing, keyset pagination, tiered search, a minimum
+    term length, facet counts, ETags, a read database with fallback or a query timeout take
+    AutocompleteJsonView's path in a thread. The target ModelAdmin's get_queryset() must not run
+    queries itself, as usual.
+    """
+
+    async def get(self, request: Any, *args: Any, **kwargs: Any) -> HttpResponse:  # type: ignore[override]
+        if not self.use_async_payload(request):
+            return await sync_to_async(super().get)(request, *args, **kwargs)
+        to_field_name = await sync_to_async(self.check_request)(request)
+        self.db = self.get_read_database()
+        return self.patch_cache_headers(JsonResponse(await self.aget_payload(to_field_name)), None)
+
+    def use_async_payload(self, request: Any) -> bool:
+        return not (
+            self.use_results_cache(request)
+            or self.use_coalescing()
+            or self.use_keyset_pagination()
+            or (get_setting('TIERED_SEARCH') if self.tiered_search is None else self.tiered_search)
+            or self.get_min_term_length()
+            or FACETS_QUERY_PARAM in request.GET
+            or self.get_etag_mode(request)
+            or (self.get_read_database() is not None and get_setting('READ_DATABASE_FALLBACK'))
+            or self.get_query_timeout()
+        )
+
+    async def aget_payload(self, to_field_name: str) -> dict[str, Any]:
+        """get_payload() with the async ORM."""
+        self.to_field_name = to_field_name
+        queryset = self.project(self.add_label_relations(await self.aget_queryset()))
+        limit = self.get_paginate_by(queryset) or 20
+        page = self.get_page_number()
+        start = (page - 1) * limit
+        objects = [obj async for obj in queryset[start : start + limit + 1]]
+        if page > 1 and not objects:
+            # As Paginator, for an empty page past the first
+            raise Http404
+        if self.label_fields:
+            results, _ = self.serialize_objects(objects[:limit])
+        else:
+            # Labels of instances may query relations that were not prefetched
+            results, _ = await sync_to_async(self.serialize_objects)(objects[:limit])
+        return {
+            'results': results,
+            'pagination': {'more': len(objects) > limit},
+        }
+
+    async def aget_queryset(self) -> Any:
+        """get_queryset() searching through SearchBackend.asearch()."""
+        qs = self.get_choices_queryset()
+        qs, search_use_distinct = await self.get_search_backend().asearch(self.request, self.model_admin, qs, self.term)
         if search_use_distinct:
             qs = qs.distinct()
         return qs
+
+
+def track_autocomplete_targets(admin_site: Any) -> None:
+    """
+    Start generation tracking for every model `admin_site` can serve autocomplete results of
+    (those whose ModelAdmin has or computes search fields), so processes that never served one
+    still move the generation on writes: cached responses, generation ETags and n-gram
+    indexes of other processes depend on it.
+    """
+    for model, model_admin in list(admin_site._registry.items()):
+        if model_admin.search_fields or type(model_admin).get_search_fields is not ModelAdmin.get_search_fields:
+            track_model(model)
+
+
+def async_admin_view(admin_site: Any, view: Any, cacheable: bool = False) -> Any:
+    """
+    AdminSite.admin_view() for async views (it wraps them in a sync function): the admin
+    permission check in a thread, then the view awaited, and unless `cacheable`, a non-cacheable response.
+    """
+
+    @wraps(view)
+    async def inner(request: Any, *args: Any, **kwargs: Any) -> HttpResponse:
+        if not await sync_to_async(admin_site.has_permission)(request):
+            # Inner import, as in AdminSite.admin_view()
+            from django.contrib.auth.views import redirect_to_login
+
+            return redirect_to_login(request.get_full_path(), reverse('admin:login', current_app=admin_site.name))
+        response = await view(request, *args, **kwargs)
+        if not cacheable:
+            add_never_cache_headers(response)
+        return response
+
+    inner.admin_site = admin_site  # type: ignore[attr-defined]
+    return inner
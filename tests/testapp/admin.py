@@ -9,6 +9,7 @@ from django.contrib import admin
 from django.urls import path, reverse
 
 from admin_auto_filters.filters import AutocompleteFilter, AutocompleteFilterFactory
+from admin_auto_filters.views import AsyncAutocompleteJsonView, async_admin_view
 
 from .models import (
     Book,
@@ -291,6 +292,11 @@ class PersonAdmin(CustomAdmin):
                 self.admin_site.admin_view(FoodsThatAreFavorites.as_view(admin_site=self.admin_site)),
                 name='foods_that_are_favorites',
             ),
+            path(
+                'async_autocomplete/',
+                async_admin_view(self.admin_site, AsyncAutocompleteJsonView.as_view(admin_site=self.admin_site)),
+                name='async_autocomplete',
+            ),
         ]
         return custom_urls + urls
 
@@ -0,0 +1,256 @@
+"""
+Micro-benchmarks for admin_auto_filters hot paths, run against a throwaway test database.
+
+    ./tests_manage.py benchmark            # every benchmark
+    ./tests_manage.py benchmark media -n 500
+"""
+
+from __future__ import annotations
+
+import time
+from collections.abc import Callable
+from typing import Any
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.test.utils import setup_databases, teardown_databases
+from django.urls import reverse
+
+from tests.testapp.admin import SHORTCUT_USERNAME
+from tests.testapp.models import Coupon, Device, Food, Member, Person, PingLog
+
+BENCHMARKS: dict[str, Callable[[Command, int], None]] = {}
+
+
+def benchmark(func: Callable[[Command, int], None]) -> Callable[[Command, int], None]:
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+def timed(func: Callable[[], Any], number: int) -> float:
+    """Return the mean wall time of `func` in milliseconds."""
+    func()  # warm-up
+    start = time.perf_counter()
+    for _ in range(number):
+        func()
+    return (time.perf_counter() - start) * 1000 / number
+
+
+def changelist_request(url: str) -> Any:
+    request = RequestFactory().get(url)
+    request.user = User.objects.get(username=SHORTCUT_USERNAME)
+    return request
+
+
+@benchmark
+def media(command: Command, number: int) -> None:
+    """Per-request cost of filter media handling: legacy class mutation vs the memoized registry."""
+    from django.forms.widgets import Media
+
+    from admin_auto_filters import filters
+
+    def legacy_add_media(self: Any, model_admin: Any) -> None:
+        # The pre-registry implementation, kept here for comparison
+        widget = self.get_widget()
+        if not hasattr(model_admin, 'Media'):
+            model_admin.__class__.Media = type('Media', (object,), {})
+            model_admin.__class__.media = filters.media_property(model_admin.__class__)
+
+        def _get_media(obj: Any) -> Media:
+            return Media(media=getattr(obj, 'Media', None))
+
+        merged = _get_media(model_admin) + widget.media + _get_media(filters.AutocompleteFilterBase) + _get_media(self)
+        for name in filters.MEDIA_TYPES:
+            setattr(model_admin.Media, name, getattr(merged, '_' + name))
+
+    model_admin = admin.site.get_model_admin(Person)
+    request = changelist_request(reverse('admin:testapp_person_changelist'))
+    flt = model_admin.get_changelist_instance(request).filter_specs[0]
+
+    command.report('media: _add_media (legacy)', timed(lambda: legacy_add_media(flt, model_admin), number))
+    command.report('media: _add_media (registry)', timed(lambda: flt._add_media(model_admin), number))
+
+    with mock.patch.object(filters.AutocompleteFilterBase, '_add_media', legacy_add_media):
+        command.report('media: changelist instance (legacy)', timed(lambda: model_admin.get_changelist_instance(request), number))
+    command.report('media: changelist instance (registry)', timed(lambda: model_admin.get_changelist_instance(request), number))
+
+
+@benchmark
+def strategies(command: Command, number: int) -> None:
+    """DISTINCT vs pk IN (subquery) vs EXISTS for a filter through a multi-valued relation (PingLog by device__members)."""
+    from admin_auto_filters.filters import FILTER_STRATEGIES, apply_filter_conditions
+
+    members = Member.objects.bulk_create(Member(name=f'member-{i}') for i in range(500))
+    devices = Device.objects.bulk_create(Device(slug=f'device-{i}') for i in range(1000))
+    Device.members.through.objects.bulk_create(
+        Device.members.through(device_id=device.pk, member_id=members[(device.pk * 7 + k) % len(members)].pk) for device in devices for k in range(5)
+    )
+    PingLog.objects.bulk_create(PingLog(device=devices[i % len(devices)], ip=f'10.0.{i // 256 % 256}.{i % 256}') for i in range(20000))
+
+    conditions = {'device__members': members[7].pk}
+    for strategy in FILTER_STRATEGIES:
+        queryset = apply_filter_conditions(PingLog.objects.order_by('-pk'), conditions, may_have_duplicates=True, strategy=strategy)
+
+        def changelist_page(queryset: Any = queryset) -> None:
+            queryset.count()
+            list(queryset[:100])
+
+        command.report(f'strategies: count + first page ({strategy})', timed(changelist_page, max(number // 10, 1)))
+
+
+@benchmark
+def pagination(command: Command, number: int) -> None:
+    """A deep autocomplete page: Paginator (COUNT + OFFSET) vs keyset pagination (pk seek, no COUNT)."""
+    from django.core.cache import caches
+    from django.test import override_settings
+
+    from admin_auto_filters.views import AutocompleteJsonView
+
+    Person.objects.bulk_create(Person(name=f'person-{i}') for i in range(50000))
+    view = AutocompleteJsonView.as_view(admin_site=admin.site)
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': 'person', 'page': '50'}
+    request = changelist_request(reverse('admin:admin-autocomplete') + '?' + urlencode(params))
+
+    command.report('pagination: page 50 (paginator)', timed(lambda: view(request), max(number // 10, 1)))
+    with override_settings(ADMIN_AUTO_FILTERS_KEYSET_PAGINATION=True):
+        caches['default'].clear()
+        command.report('pagination: page 50 (keyset, OFFSET fallback)', timed(lambda: view(request), max(number // 10, 1)))
+        # Walk to page 50 once so its cursor is remembered, as Select2 does while scrolling
+        for page in range(1, 50):
+            view(changelist_request(reverse('admin:admin-autocomplete') + '?' + urlencode({**params, 'page': str(page)})))
+        command.report('pagination: page 50 (keyset, cursor)', timed(lambda: view(request), max(number // 10, 1)))
+
+
+@benchmark
+def projection(command: Command, number: int) -> None:
+    """Serializing a page of 500 autocomplete results: model instances vs label_fields rows."""
+    from django.test import override_settings
+
+    from admin_auto_filters.views import AutocompleteJsonView
+
+    class InstanceView(AutocompleteJsonView):
+        paginate_by = 500
+
+    class ProjectionView(InstanceView):
+        label_fields = ('name',)
+
+    Person.objects.bulk_create(Person(name=f'person-{i}') for i in range(5000))
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': 'person'}
+    request = changelist_request(reverse('admin:admin-autocomplete') + '?' + urlencode(params))
+    # Keyset pagination leaves out the COUNT both modes would share
+    with override_settings(ADMIN_AUTO_FILTERS_KEYSET_PAGINATION=True):
+        for label, view_cls in (('instances', InstanceView), ('label_fields', ProjectionView)):
+            view = view_cls.as_view(admin_site=admin.site)
+            command.report(f'projection: 500 results ({label})', timed(lambda view=view: view(request), max(number // 10, 1)))
+
+
+@benchmark
+def search(command: Command, number: int) -> None:
+    """Autocomplete search over 50k rows: icontains lookups vs the n-gram index vs SQLite FTS5."""
+    from admin_auto_filters.search import ModelAdminSearchBackend, NgramSearchBackend, SQLiteFTS5SearchBackend
+    from admin_auto_filters.views import AutocompleteJsonView
+
+    Food.objects.bulk_create(Food(name=f'food-{i}') for i in range(50000))
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'favorite_food', 'term': 'food-4242'}
+    request = changelist_request(reverse('admin:admin-autocomplete') + '?' + urlencode(params))
+    for backend in (ModelAdminSearchBackend, NgramSearchBackend, SQLiteFTS5SearchBackend):
+        view = type('View', (AutocompleteJsonView,), {'search_backend': backend}).as_view(admin_site=admin.site)
+        # The warm-up builds the index or FTS table
+        command.report(f'search: 50k rows ({backend.__name__})', timed(lambda view=view: view(request), max(number // 10, 1)))
+
+
+@benchmark
+def tiered(command: Command, number: int) -> None:
+    """Prefix search over 200k coupon codes: icontains only vs exact and istartswith tiers first."""
+    from django.test import override_settings
+
+    from admin_auto_filters.views import AutocompleteJsonView
+
+    Coupon.objects.bulk_create(Coupon(code=f'CODE{i:06d}') for i in range(200000))
+    view = AutocompleteJsonView.as_view(admin_site=admin.site)
+    params = {'app_label': 'testapp', 'model_name': 'bugreport', 'field_name': 'reward_coupon', 'term': 'CODE1999'}
+    request = changelist_request(reverse('admin:admin-autocomplete') + '?' + urlencode(params))
+    command.report('tiered: prefix term (icontains)', timed(lambda: view(request), max(number // 10, 1)))
+    with override_settings(ADMIN_AUTO_FILTERS_TIERED_SEARCH=True):
+        command.report('tiered: prefix term (tiered)', timed(lambda: view(request), max(number // 10, 1)))
+
+
+@benchmark
+def concurrency(command: Command, number: int) -> None:
+    """Throughput of 20 concurrent autocomplete requests on the ASGI test client: sync vs async view."""
+    import asyncio
+
+    from django.test import AsyncClient, override_settings
+
+    Person.objects.bulk_create(Person(name=f'person-{i}') for i in range(5000))
+    client = AsyncClient()
+    client.force_login(User.objects.get(username=SHORTCUT_USERNAME))
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': 'person-4'}
+
+    async def burst(url: str) -> None:
+        responses = await asyncio.gather(*(client.get(url, params) for _ in range(20)))
+        assert all(response.status_code == 200 for response in responses)
+
+    for label, name in (('sync', 'admin:admin-autocomplete'), ('async', 'admin:async_autocomplete')):
+        url = reverse(name)
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            command.report(f'concurrency: 20 requests ({label} view)', timed(lambda url=url: asyncio.run(burst(url)), max(number // 20, 1)))
+
+
+@benchmark
+def batch(command: Command, number: int) -> None:
+    """Five dropdowns opening on the test client: one request each vs one batch request."""
+    from django.test import Client, override_settings
+
+    client = Client()
+    client.force_login(User.objects.get(username=SHORTCUT_USERNAME))
+    fields = ('best_friend', 'favorite_food', 'least_favorite_food', 'favorite_book', 'siblings')
+    queries = [{'app_label': 'testapp', 'model_name': 'person', 'field_name': field, 'term': ''} for field in fields]
+    single_url, batch_url = reverse('admin:admin-autocomplete'), reverse('admin:admin-autocomplete-batch')
+
+    def singles() -> None:
+        for query in queries:
+            client.get(single_url, query)
+
+    with override_settings(ALLOWED_HOSTS=['testserver']):
+        command.report('batch: 5 fields (5 requests)', timed(singles, number))
+        command.report('batch: 5 fields (1 batch request)', timed(lambda: client.get(batch_url, {'q': [urlencode(q) for q in queries]}), number))
+
+
+@benchmark
+def budget(command: Command, number: int) -> None:
+    """A term matching nothing in 500k rows: unbudgeted vs a 20 ms query timeout."""
+    from admin_auto_filters.views import AutocompleteJsonView
+
+    Food.objects.bulk_create((Food(name=f'food-{i}') for i in range(500000)), batch_size=10000)
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'favorite_food', 'term': 'nothing'}
+    request = changelist_request(reverse('admin:admin-autocomplete') + '?' + urlencode(params))
+    for timeout in (None, 0.02):
+        view = type('View', (AutocompleteJsonView,), {'query_timeout': timeout}).as_view(admin_site=admin.site)
+        command.report(f'budget: no match in 500k rows (timeout {timeout})', timed(lambda view=view: view(request), max(number // 20, 1)))
+
+
+class Command(BaseCommand):
+    help = 'Run admin_auto_filters micro-benchmarks against a throwaway test database.'
+
+    def add_arguments(self, parser: Any) -> None:
+        parser.add_argument('names', nargs='*', help=f'Benchmarks to run (default: all): {", ".join(sorted(BENCHMARKS))}.')
+        parser.add_argument('-n', '--number', type=int, default=200, help='Iterations per measurement.')
+
+    def report(self, label: str, milliseconds: float) -> None:
+        self.stdout.write(f'{label:<60} {milliseconds:9.3f} ms')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        unknown = set(options['names']) - BENCHMARKS.keys()
+        if unknown:
+            raise CommandError(f'Unknown benchmark(s): {", ".join(sorted(unknown))}')
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            for name in options['names'] or sorted(BENCHMARKS):
+                BENCHMARKS[name](self, options['number'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
@@ -2,18 +2,44 @@
 
 from __future__ import annotations
 
+import gc
+import itertools
 import json
+import threading
+import time
+import weakref
+from collections.abc import Iterator
+from contextlib import contextmanager, nullcontext
 from typing import Any
+from unittest import mock, skipIf
 from urllib.parse import urlencode
 
+from asgiref.sync import sync_to_async
+from django import VERSION as DJANGO_VERSION
+from django import forms
+from django.contrib import admin
 from django.contrib.admin.utils import flatten
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Permission, User
 from django.core import exceptions
-from django.test import TestCase, tag
-from django.urls import reverse
+from django.core.cache import caches
+from django.db import OperationalError, connection, connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.test import RequestFactory, TestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse, reverse_lazy
+from django.utils import translation
 
-from admin_auto_filters import filters
-from tests.testapp.admin import BASIC_USERNAME, SHORTCUT_USERNAME
+from admin_auto_filters import cache as cache_module
+from admin_auto_filters import filters, views
+from admin_auto_filters.budget import QueryBudget
+from admin_auto_filters.cache import SingleFlight, bump_generation, get_generation
+from admin_auto_filters.changelist import CombinedFiltersChangeList
+from admin_auto_filters.media import filter_media
+from admin_auto_filters.ngram import clear_ngram_indexes
+from admin_auto_filters.search import ModelAdminSearchBackend, SearchBackend, SQLiteFTS5SearchBackend, get_tier_fields
+from admin_auto_filters.testing import QueryCountAssertionsMixin
+from admin_auto_filters.views import AsyncAutocompleteJsonView, AutocompleteJsonView
+from tests.testapp.admin import BASIC_USERNAME, SHORTCUT_USERNAME, CustomAdmin, FriendFilter, PersonAdmin
 from tests.testapp.models import Book, BugReport, Collection, Coupon, CouponUser, Device, Food, Member, Person, PingLog
 
 
@@ -310,3 +336,1500 @@ class ShowcaseTests(TestCase):
         texts = {item['text'] for item in data['results']}
         self.assertIn('XSS', texts)
         self.assertIn('SQLi', texts)
+
+
+class FilterSpecCacheTests(TestCase):
+    """Field/model resolution is cached per (filter class, model, model admin class)."""
+
+    def setUp(self) -> None:
+        filters.clear_filter_spec_cache()
+        self.addCleanup(filters.clear_filter_spec_cache)
+        self.client.force_login(User.objects.get(username=SHORTCUT_USERNAME))
+
+    def test_spec_is_resolved_once(self) -> None:
+        url = reverse('admin:testapp_person_changelist') + '?best_friend__best_friend=1'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        with mock.patch.object(filters.AutocompleteFilterBase, 'build_spec', side_effect=AssertionError('spec rebuilt')):
+            response = self.client.get(url)
+        self.assertContains(response, '<td class="field-id">4</td>', html=True)
+
+    def test_spec_contents(self) -> None:
+        filter_cls = PersonAdmin.list_filter_auto[3]  # best_friend__best_friend
+        model_admin = PersonAdmin(Person, admin.site)
+        spec = filter_cls.resolve_spec(Person, model_admin)
+        self.assertIs(spec, filter_cls.resolve_spec(Person, model_admin))
+        self.assertEqual(spec.parameter_name, 'best_friend__best_friend')
+        self.assertIs(spec.rel_model, Person)
+        self.assertEqual(spec.remote_field, Person._meta.get_field('best_friend'))
+        self.assertIs(spec.related_model, Person)
+        self.assertFalse(spec.may_have_duplicates)
+
+        siblings = PersonAdmin.list_filter_auto[5].resolve_spec(Person, model_admin)
+        self.assertTrue(siblings.may_have_duplicates)
+
+    def render(self, filter_cls: Any, params: dict[str, Any]) -> str:
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'))
+        request.user = User.objects.get(username=SHORTCUT_USERNAME)
+        return filter_cls(request, params, Person, admin.site.get_model_admin(Person)).rendered_widget
+
+    def test_per_request_classes_are_released(self) -> None:
+        filter_cls = filters.AutocompleteFilterFactory('food', 'favorite_food', label_by=lambda food: food.name.upper())
+        self.assertIn('SPAM', self.render(filter_cls, {'favorite_food': ['1']}))
+        released = weakref.ref(filter_cls)
+        del filter_cls
+        gc.collect()
+        self.assertIsNone(released())
+
+    def test_queryset_is_built_per_request(self) -> None:
+        filter_cls = filters.AutocompleteFilterFactory('food', 'favorite_food')
+        self.assertIn('>Spam</option>', self.render(filter_cls, {'favorite_food': ['1']}))
+        with mock.patch.object(filter_cls, 'get_queryset_for_field', return_value=Food.objects.exclude(pk=1)):
+            self.assertNotIn('>Spam</option>', self.render(filter_cls, {'favorite_food': ['1']}))
+
+    def test_clear_filter_spec_cache(self) -> None:
+        filter_cls = PersonAdmin.list_filter_auto[0]
+        model_admin = PersonAdmin(Person, admin.site)
+        spec = filter_cls.resolve_spec(Person, model_admin)
+        filters.clear_filter_spec_cache()
+        self.assertIsNot(spec, filter_cls.resolve_spec(Person, model_admin))
+
+
+class FilterMediaTests(TestCase):
+    """Filter media is merged once per admin class and never written onto ModelAdmin.Media."""
+
+    def setUp(self) -> None:
+        self.client.force_login(User.objects.get(username=SHORTCUT_USERNAME))
+
+    def test_changelist_includes_filter_media(self) -> None:
+        response = self.client.get(reverse('admin:testapp_person_changelist'))
+        self.assertContains(response, '/static/custom.css')
+        self.assertContains(response, 'admin/js/autocomplete.js')
+        self.assertContains(response, 'django-admin-autocomplete-filter/js/autocomplete_filter_qs.js')
+        self.assertContains(response, 'django-admin-autocomplete-filter/css/autocomplete-fix.css')
+        self.assertNotIn('js', CustomAdmin.Media.__dict__)
+        self.assertEqual(CustomAdmin.Media.css, {'all': ('custom.css',)})
+
+    def test_media_is_merged_once(self) -> None:
+        url = reverse('admin:testapp_person_changelist')
+        self.client.get(url)
+        merged = filter_media.get_media(PersonAdmin, 'en')
+        self.assertIn('django-admin-autocomplete-filter/js/autocomplete_filter_qs.js', str(merged))
+        with mock.patch.object(filter_media, '_lock', None):  # any slow-path merge would fail on `with None`
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertIs(filter_media.get_media(PersonAdmin, 'en'), merged)
+
+
+class LabelResolverTests(TestCase):
+    """Selected values of all autocomplete filters are labelled with one query per related model."""
+
+    def setUp(self) -> None:
+        self.client.force_login(User.objects.get(username=SHORTCUT_USERNAME))
+
+    def label_queries(self, url: str) -> list[str]:
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.response = response
+        return [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "testapp_person"."id"') and ' IN (' in q['sql']]
+
+    def test_one_query_per_related_model(self) -> None:
+        queries = self.label_queries(reverse('admin:testapp_person_changelist') + '?best_friend=1&twin=3&siblings=2')
+        self.assertEqual(len(queries), 1, msg=queries)
+        self.assertContains(self.response, '<option value="1" selected>Alice</option>', html=True)
+        self.assertContains(self.response, '<option value="3" selected>Carol</option>', html=True)
+        self.assertContains(self.response, '<option value="2" selected>Bob</option>', html=True)
+
+    def test_custom_labels_are_kept(self) -> None:
+        # food (auto) uses label_by='alternate_name' on the same related model as other filters
+        self.label_queries(reverse('admin:testapp_person_changelist') + '?favorite_food=3&person__favorite_food=3')
+        self.assertContains(self.response, '<option value="3" selected>TOAST</option>', html=True)
+        self.assertContains(self.response, '<option value="3" selected>Toast</option>', html=True)
+
+    def test_querysets_are_not_shared(self) -> None:
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'))
+        request.user = User.objects.get(username=SHORTCUT_USERNAME)
+        model_admin = admin.site.get_model_admin(Person)
+        everyone = filters.AutocompleteFilterFactory('best friend', 'best_friend')
+        hidden = filters.AutocompleteFilterFactory('best friend', 'best_friend')
+        with mock.patch.object(hidden, 'get_queryset_for_field', return_value=Person.objects.exclude(pk=1)):
+            html = everyone(request, {'best_friend': ['1']}, Person, model_admin).rendered_widget
+            self.assertIn('<option value="1" selected>Alice</option>', html)
+            html = hidden(request, {'best_friend': ['1']}, Person, model_admin).rendered_widget
+            self.assertNotIn('Alice', html)
+
+        # Filters with the same queryset still share one fetch
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'))
+        request.user = User.objects.get(username=SHORTCUT_USERNAME)
+        with CaptureQueriesContext(connection) as queries:
+            for filter_cls in (everyone, filters.AutocompleteFilterFactory('best friend', 'best_friend')):
+                self.assertIn('Alice', filter_cls(request, {'best_friend': ['1']}, Person, model_admin).rendered_widget)
+        self.assertEqual(len([query for query in queries if 'testapp_person' in query['sql']]), 1)
+
+
+class LazyWidgetRenderTests(TestCase):
+    """rendered_widget is only built when the filter sidebar is rendered."""
+
+    def setUp(self) -> None:
+        self.user = User.objects.get(username=SHORTCUT_USERNAME)
+        self.model_admin = admin.site.get_model_admin(Person)
+
+    def get_changelist(self, query: str) -> Any:
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist') + query)
+        request.user = self.user
+        return self.model_admin.get_changelist_instance(request)
+
+    def test_changelist_instance_does_not_render(self) -> None:
+        self.get_changelist('')  # warm spec and media caches
+        with CaptureQueriesContext(connection) as without_filters:
+            self.get_changelist('')
+        with (
+            mock.patch.object(filters.AutocompleteSelectMixin, 'optgroups', side_effect=AssertionError('rendered')),
+            CaptureQueriesContext(connection) as with_filters,
+        ):
+            changelist = self.get_changelist('?best_friend=1&twin=3&siblings=2')
+        # Same query count as an unfiltered changelist: no label lookups, only the filtered results and counts
+        self.assertEqual(len(with_filters), len(without_filters), msg=[q['sql'] for q in with_filters.captured_queries])
+        for spec in changelist.filter_specs:
+            self.assertNotIn('rendered_widget', spec.__dict__)
+
+    def test_rendered_widget_is_cached(self) -> None:
+        changelist = self.get_changelist('?best_friend=1')
+        spec = changelist.filter_specs[0]
+        with self.assertNumQueries(1):
+            html = spec.rendered_widget
+        self.assertInHTML('<option value="1" selected>Alice</option>', html)
+        with self.assertNumQueries(0):
+            self.assertIs(spec.rendered_widget, html)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'widget-cache-tests'}})
+class WidgetFragmentCacheTests(TestCase):
+    """Opt-in fragment cache for rendered filter widgets, invalidated through the related model's generation."""
+
+    def setUp(self) -> None:
+        caches['default'].clear()
+        filters.clear_filter_spec_cache()
+        self.addCleanup(filters.clear_filter_spec_cache)
+        patcher = mock.patch.object(FriendFilter, 'cache_rendered_widget', True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+        self.url = reverse('admin:testapp_person_changelist') + '?best_friend=1'
+
+    def test_rendered_widget_is_cached(self) -> None:
+        self.assertContains(self.client.get(self.url), '<option value="1" selected>Alice</option>', html=True)
+        with mock.patch.object(FriendFilter, 'render_widget', side_effect=AssertionError('not cached')):
+            response = self.client.get(self.url)
+        self.assertContains(response, '<option value="1" selected>Alice</option>', html=True)
+
+    def test_saving_related_object_invalidates(self) -> None:
+        self.client.get(self.url)
+        Person.objects.filter(pk=1).update(name='Alicia')  # queryset.update() sends no signal: still cached
+        self.assertContains(self.client.get(self.url), '<option value="1" selected>Alice</option>', html=True)
+        person = Person.objects.get(pk=1)
+        person.save()
+        self.assertContains(self.client.get(self.url), '<option value="1" selected>Alicia</option>', html=True)
+
+    def test_key_depends_on_value_and_language(self) -> None:
+        self.client.get(self.url)
+        with mock.patch.object(FriendFilter, 'render_widget', return_value='') as render:
+            self.client.get(reverse('admin:testapp_person_changelist') + '?best_friend=2')
+            with translation.override('fr'):
+                self.client.get(self.url)
+        self.assertEqual(render.call_count, 2)
+
+    def test_key_depends_on_factory_options(self) -> None:
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'))
+        request.user = User.objects.get(username=BASIC_USERNAME)
+        model_admin = admin.site.get_model_admin(Person)
+        plain = filters.AutocompleteFilterFactory('best friend', 'best_friend')
+        shouting = filters.AutocompleteFilterFactory('best friend', 'best_friend', label_by=lambda person: person.name.upper())
+        self.assertEqual(plain.__qualname__, shouting.__qualname__)
+        for filter_cls, label in ((plain, 'Alice'), (shouting, 'ALICE')):
+            with mock.patch.object(filter_cls, 'cache_rendered_widget', True):
+                html = filter_cls(request, {'best_friend': ['1']}, Person, model_admin).rendered_widget
+            self.assertIn(f'<option value="1" selected>{label}</option>', html)
+
+
+class FactoryWarmupTests(TestCase):
+    """Factory filters create no classes and reverse no URLs per request once warmed up."""
+
+    def setUp(self) -> None:
+        self.client.force_login(User.objects.get(username=SHORTCUT_USERNAME))
+
+    def test_no_new_classes_after_warmup(self) -> None:
+        url = reverse('admin:testapp_person_changelist') + '?favorite_food=3&best_friend=1'
+        self.client.get(url)
+        with (
+            mock.patch('admin_auto_filters.filters._build_choice_field', side_effect=AssertionError('class created')),
+            mock.patch('admin_auto_filters.filters.reverse', side_effect=AssertionError('reverse() not memoized')),
+        ):
+            for _ in range(3):
+                response = self.client.get(url)
+        self.assertContains(response, '<option value="3" selected>TOAST</option>', html=True)
+
+    def test_choice_fields_are_interned(self) -> None:
+        self.assertIs(filters.generate_choice_field('alternate_name'), filters.generate_choice_field('alternate_name'))
+        self.assertIsNot(filters.generate_choice_field('alternate_name'), filters.generate_choice_field(str))
+
+
+class FilterStrategyTests(TestCase):
+    """'subquery' and 'exists' strategies match 'distinct' for every relation shape, without DISTINCT."""
+
+    def changelist_pks(self, username: str, model: Any, key: str, val: str) -> tuple[list[Any], str]:
+        request = RequestFactory().get(reverse(f'admin:testapp_{name(model)}_changelist'), {key: val})
+        request.user = User.objects.get(username=username)
+        changelist = admin.site.get_model_admin(model).get_changelist_instance(request)
+        queryset = changelist.get_queryset(request)
+        return list(queryset.values_list('pk', flat=True)), str(queryset.query)
+
+    def test_strategies(self) -> None:
+        for strategy in filters.FILTER_STRATEGIES:
+            for username in (BASIC_USERNAME, SHORTCUT_USERNAME):
+                for model, key, val, _, pks in FILTER_STRINGS:
+                    with (
+                        self.subTest(strategy=strategy, username=username, model=model.__name__, key=key),
+                        mock.patch.object(filters.AutocompleteFilterBase, 'filter_strategy', strategy),
+                    ):
+                        found, sql = self.changelist_pks(username, model, key, val)
+                        self.assertEqual(sorted(found), sorted(pks))
+                        if strategy != filters.FILTER_STRATEGY_DISTINCT:
+                            self.assertNotIn('DISTINCT', sql)
+
+    def test_showcase_relations(self) -> None:
+        member = Member.objects.create(name='Alice')
+        device = Device.objects.create(slug='router-1')
+        device.members.add(member, Member.objects.create(name='Bob'))
+        PingLog.objects.create(device=device, ip='10.0.0.1')
+        coupon = Coupon.objects.create(code='AAA111')
+        Coupon.objects.create(code='BBB222')
+        CouponUser.objects.create(coupon=coupon, user_id=1)
+        CouponUser.objects.create(coupon=coupon, user_id=1)
+        for strategy in (filters.FILTER_STRATEGY_SUBQUERY, filters.FILTER_STRATEGY_EXISTS):
+            with mock.patch.object(filters.AutocompleteFilterBase, 'filter_strategy', strategy):
+                for model, key, val, expected in (
+                    (PingLog, 'device__members', str(member.pk), 1),
+                    (Member, 'devices', str(device.pk), 2),
+                    (Coupon, 'users__user', '1', 1),
+                ):
+                    with self.subTest(strategy=strategy, key=key):
+                        found, sql = self.changelist_pks(BASIC_USERNAME, model, key, val)
+                        self.assertEqual(len(found), expected)
+                        self.assertNotIn('DISTINCT', sql)
+
+    def test_factory_argument_and_validation(self) -> None:
+        filter_cls = filters.AutocompleteFilterFactory('Member', 'device__members', filter_strategy='exists')
+        self.assertEqual(filter_cls.filter_strategy, 'exists')
+        with self.assertRaises(exceptions.ImproperlyConfigured):
+            filters.apply_filter_conditions(Person.objects.all(), {'siblings': 1}, may_have_duplicates=True, strategy='join')
+
+
+class FriendsMultipleFilter(filters.AutocompleteFilterMultiple):
+    title = 'best friends'
+    field_name = 'best_friend'
+    rel_model = Person
+    parameter_name = 'best_friend__in'
+    max_values = 2
+
+
+class ValueCoercionTests(TestCase):
+    """Filter values are converted with the target field and invalid ones never reach the database."""
+
+    def get_changelist(self, params: dict[str, str]) -> Any:
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'), params)
+        request.user = User.objects.get(username=BASIC_USERNAME)
+        return request, admin.site.get_model_admin(Person).get_changelist_instance(request)
+
+    def test_coerce_values(self) -> None:
+        spec = FriendsMultipleFilter.resolve_spec(Person, admin.site.get_model_admin(Person))
+        self.assertEqual(FriendsMultipleFilter.coerce_values(spec, ' 2,x,2,,1,3'), [2, 1])
+        self.assertEqual(FriendsMultipleFilter.coerce_values(spec, 'x,y'), [])
+        book_spec = filters.AutocompleteFilterFactory('book', 'book').resolve_spec(Person, admin.site.get_model_admin(Person))
+        self.assertEqual(book_spec.target_field, Book._meta.get_field('isbn'))
+
+    def test_invalid_value_short_circuits(self) -> None:
+        request, changelist = self.get_changelist({'best_friend': 'abc'})
+        queryset = changelist.get_queryset(request)
+        with self.assertNumQueries(0):
+            self.assertEqual(list(queryset), [])
+            self.assertEqual(queryset.count(), 0)
+        friend_filter = next(spec for spec in changelist.filter_specs if isinstance(spec, FriendFilter))
+        with self.assertNumQueries(0):
+            self.assertNotIn('selected', friend_filter.rendered_widget)
+
+    def test_invalid_value_renders_changelist(self) -> None:
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+        response = self.client.get(reverse('admin:testapp_person_changelist') + '?best_friend=abc', follow=False)
+        self.assertEqual(response.status_code, 200)
+
+    def test_out_of_range_value_renders_changelist(self) -> None:
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+        response = self.client.get(reverse('admin:testapp_person_changelist'), {'best_friend': '99999999999999999999'})
+        self.assertEqual(response.status_code, 200)
+        spec = FriendsMultipleFilter.resolve_spec(Person, admin.site.get_model_admin(Person))
+        self.assertEqual(FriendsMultipleFilter.coerce_values(spec, '99999999999999999999,1'), [1])
+
+    def test_valid_value_is_coerced(self) -> None:
+        request, changelist = self.get_changelist({'best_friend': ' 1 '})
+        friend_filter = next(spec for spec in changelist.filter_specs if isinstance(spec, FriendFilter))
+        self.assertEqual(friend_filter.get_values(), [1])
+        self.assertEqual(sorted(changelist.get_queryset(request).values_list('pk', flat=True)), [2, 3])
+        self.assertIn('selected', friend_filter.rendered_widget)
+
+
+class CombinedFiltersTests(TestCase):
+    """CombinedFiltersChangeList applies active autocomplete filters together, with the same rows."""
+
+    def get_changelist(self, username: str, params: dict[str, str], combined: bool = True) -> Any:
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'), params)
+        request.user = User.objects.get(username=username)
+        model_admin = admin.site.get_model_admin(Person)
+        if not combined:
+            return request, model_admin.get_changelist_instance(request)
+        with mock.patch.object(model_admin, 'get_changelist', return_value=CombinedFiltersChangeList):
+            return request, model_admin.get_changelist_instance(request)
+
+    def get_pks(self, username: str, params: dict[str, str], combined: bool = True) -> list[Any]:
+        request, changelist = self.get_changelist(username, params, combined)
+        return sorted(changelist.get_queryset(request).values_list('pk', flat=True))
+
+    def test_same_rows(self) -> None:
+        person_filters = [(key, val) for model, key, val, _, _ in FILTER_STRINGS if model is Person]
+        for username in (BASIC_USERNAME, SHORTCUT_USERNAME):
+            for i, first in enumerate(person_filters):
+                for second in person_filters[i + 1 :]:
+                    params = dict((first, second))
+                    with self.subTest(username=username, params=params):
+                        self.assertEqual(self.get_pks(username, params), self.get_pks(username, params, combined=False))
+
+    def test_groups_single_valued_filters(self) -> None:
+        params = {'best_friend__best_friend': '1', 'best_friend__favorite_food': '1', 'siblings': '2'}
+        request, changelist = self.get_changelist(BASIC_USERNAME, params)
+        self.assertEqual(sorted(changelist.get_queryset(request).values_list('pk', flat=True)), [4])
+        groups = {spec.parameter_name: spec.filter_group for spec in changelist.filter_specs if spec.parameter_name in params}
+        self.assertIsNotNone(groups['best_friend__best_friend'])
+        self.assertIs(groups['best_friend__best_friend'], groups['best_friend__favorite_food'])
+        self.assertIsNone(groups['siblings'])
+
+        with mock.patch.object(CombinedFiltersChangeList, 'combine_multi_valued_filters', True):
+            request, changelist = self.get_changelist(BASIC_USERNAME, params)
+        group = next(spec.filter_group for spec in changelist.filter_specs if spec.parameter_name == 'siblings')
+        self.assertEqual(len(group.members), 3)
+
+    def test_invalid_value_empties_group(self) -> None:
+        request, changelist = self.get_changelist(BASIC_USERNAME, {'best_friend': '1', 'twin': 'abc'})
+        queryset = changelist.get_queryset(request)
+        with self.assertNumQueries(0):
+            self.assertEqual(list(queryset), [])
+
+
+@skipIf(DJANGO_VERSION < (5, 0), 'admin facets were added in Django 5.0')
+class FacetCountTests(TestCase):
+    """Facet counts for selected values and autocomplete results, one GROUP BY query each."""
+
+    def get_filter(self, params: dict[str, str]) -> Any:
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'), params)
+        request.user = User.objects.get(username=BASIC_USERNAME)
+        changelist = admin.site.get_model_admin(Person).get_changelist_instance(request)
+        friend_filter = next(spec for spec in changelist.filter_specs if isinstance(spec, FriendFilter))
+        list(friend_filter.choices(changelist))
+        return friend_filter
+
+    def test_selected_value_count(self) -> None:
+        friend_filter = self.get_filter({'_facets': 'True', 'best_friend': '1'})
+        with self.assertNumQueries(2):  # the counts and the selected label
+            self.assertIn('Alice (2)', friend_filter.rendered_widget)
+
+    def test_other_filters_narrow_counts(self) -> None:
+        friend_filter = self.get_filter({'_facets': 'True', 'best_friend': '1', 'twin': '1'})
+        self.assertIn('Alice (1)', friend_filter.rendered_widget)
+
+    def test_capped_count(self) -> None:
+        with mock.patch.object(FriendFilter, 'facet_max_rows', 1):
+            friend_filter = self.get_filter({'_facets': 'True', 'best_friend': '1'})
+            self.assertIn('Alice (1+)', friend_filter.rendered_widget)
+
+    def test_without_facets(self) -> None:
+        friend_filter = self.get_filter({'best_friend': '1'})
+        self.assertIsNone(friend_filter.get_facets_token())
+        self.assertIn('Alice', friend_filter.rendered_widget)
+        self.assertNotIn('Alice (', friend_filter.rendered_widget)
+
+    def test_autocomplete_result_counts(self) -> None:
+        friend_filter = self.get_filter({'_facets': 'True'})
+        token = friend_filter.get_facets_token()
+        self.assertIn(f'{filters.FACETS_QUERY_PARAM}=', friend_filter.get_widget().get_url())
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+        url = reverse('admin:admin-autocomplete')
+        params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': ''}
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get(url, params)
+        with CaptureQueriesContext(connection) as counted:
+            response = self.client.get(url, {**params, filters.FACETS_QUERY_PARAM: token})
+        self.assertEqual(len(counted), len(plain) + 1)
+        texts = [result['text'] for result in response.json()['results']]
+        expected = [f'{person} ({Person.objects.filter(best_friend=person).count()})' for person in Person.objects.order_by('id')]
+        self.assertEqual(texts, expected)
+
+        response = self.client.get(url, {**params, filters.FACETS_QUERY_PARAM: token + 'x'})
+        self.assertEqual([result['text'] for result in response.json()['results']], [str(p) for p in Person.objects.order_by('id')])
+
+    def test_autocomplete_counts_follow_changelist(self) -> None:
+        friend_filter = self.get_filter({'_facets': 'True', 'q': 'Carol'})
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+        params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': ''}
+        response = self.client.get(reverse('admin:admin-autocomplete'), {**params, filters.FACETS_QUERY_PARAM: friend_filter.get_facets_token()})
+        searched = Person.objects.filter(pk__in=friend_filter.changelist.get_queryset(friend_filter.request).values('pk'))
+        expected = [f'{person} ({searched.filter(best_friend=person).count()})' for person in Person.objects.order_by('id')]
+        self.assertEqual([result['text'] for result in response.json()['results']], expected)
+        self.assertNotEqual(expected, [f'{person} ({Person.objects.filter(best_friend=person).count()})' for person in Person.objects.order_by('id')])
+        # The selected value's count agrees
+        selected = self.get_filter({'_facets': 'True', 'q': 'Carol', 'best_friend': '1'})
+        self.assertIn(expected[0], selected.rendered_widget)
+
+    def test_count_facets_multi_valued(self) -> None:
+        counts, truncated = filters.count_facets(Person.objects.all(), 'siblings', [1, 2, 3], max_rows=None)
+        self.assertFalse(truncated)
+        for pk in (1, 2, 3):
+            self.assertEqual(counts.get(str(pk), 0), Person.objects.filter(siblings=pk).count())
+
+
+@contextmanager
+def fresh_process() -> Iterator[None]:
+    """Forget generation tracking and change listeners, as in a process that has not served any request yet."""
+    tracked = set(cache_module._tracked_models)
+    listeners = dict(cache_module._change_listeners)
+    cache_module._change_listeners.clear()
+    for model in tracked:
+        uid = f'{cache_module.KEY_PREFIX}:{model._meta.label_lower}'
+        post_save.disconnect(sender=model, dispatch_uid=uid)
+        post_delete.disconnect(sender=model, dispatch_uid=uid)
+    cache_module._tracked_models.clear()
+    try:
+        yield
+    finally:
+        for model in tracked:
+            cache_module.track_model(model)
+        cache_module._change_listeners.clear()
+        cache_module._change_listeners.update(listeners)
+
+
+@override_settings(ADMIN_AUTO_FILTERS_RESULTS_CACHE=True)
+class ResultsCacheTests(TestCase):
+    """Opt-in AutocompleteJsonView response cache, invalidated through the target model's generation."""
+
+    url = reverse_lazy('admin:admin-autocomplete')
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': 'a'}
+
+    def setUp(self) -> None:
+        caches['default'].clear()
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+
+    def get_texts(self, **params: str) -> list[str]:
+        response = self.client.get(self.url, {**self.params, **params})
+        return [result['text'] for result in response.json()['results']]
+
+    def test_response_is_cached(self) -> None:
+        expected = self.get_texts()
+        with mock.patch.object(AutocompleteJsonView, 'get_payload', side_effect=AssertionError('not cached')):
+            self.assertEqual(self.get_texts(), expected)
+        with mock.patch.object(AutocompleteJsonView, 'get_payload', return_value={'results': []}) as get_payload:
+            self.assertEqual(self.get_texts(term='b'), [])
+            self.assertEqual(self.get_texts(page='2'), [])
+            self.assertEqual(self.get_texts(field_name='twin'), [])
+        self.assertEqual(get_payload.call_count, 3)
+
+    def test_saving_target_object_invalidates(self) -> None:
+        self.assertIn('Alice', self.get_texts())
+        Person.objects.filter(pk=1).update(name='Alicia')  # queryset.update() sends no signal: still cached
+        self.assertIn('Alice', self.get_texts())
+        Person.objects.get(pk=1).save()
+        self.assertIn('Alicia', self.get_texts())
+
+    def test_targets_tracked_at_startup(self) -> None:
+        with fresh_process():
+            generation = get_generation(Person)
+            Person.objects.get(pk=1).save()
+            self.assertEqual(get_generation(Person), generation)
+            # What AdminAutoFiltersConfig.ready() does, before any autocomplete request
+            views.track_autocomplete_targets(admin.site)
+            self.assertIn(Person, cache_module._tracked_models)
+            self.assertIn(Food, cache_module._tracked_models)
+            Person.objects.get(pk=1).save()
+            self.assertEqual(get_generation(Person), generation + 1)
+
+    def test_disabled(self) -> None:
+        self.get_texts()
+        with (
+            override_settings(ADMIN_AUTO_FILTERS_RESULTS_CACHE=False),
+            mock.patch.object(AutocompleteJsonView, 'get_payload', return_value={'results': []}) as get_payload,
+        ):
+            self.get_texts()
+            self.assertEqual(get_payload.call_count, 1)
+        with mock.patch.object(AutocompleteJsonView, 'get_payload', return_value={'results': []}) as get_payload:
+            self.get_texts(**{filters.FACETS_QUERY_PARAM: 'token'})
+            self.assertEqual(get_payload.call_count, 1)
+
+    def test_cache_scope(self) -> None:
+        view = AutocompleteJsonView()
+        request = RequestFactory().get(self.url)
+        request.user = User.objects.get(username=BASIC_USERNAME)
+        self.assertEqual(view.get_cache_scope(request), 'superuser')
+        staff = User.objects.create_user('staff', is_staff=True)
+        staff.user_permissions.add(Permission.objects.get(codename='view_person'))
+        request.user = User.objects.get(pk=staff.pk)
+        scope = view.get_cache_scope(request)
+        staff.user_permissions.add(Permission.objects.get(codename='change_person'))
+        request.user = User.objects.get(pk=staff.pk)
+        self.assertNotIn(view.get_cache_scope(request), (scope, 'superuser'))
+
+
+@override_settings(ADMIN_AUTO_FILTERS_KEYSET_PAGINATION=True)
+class KeysetPaginationTests(TestCase):
+    """Keyset pagination of AutocompleteJsonView: no COUNT, pk seeks instead of OFFSET."""
+
+    url = reverse_lazy('admin:admin-autocomplete')
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': 'Zed'}
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        Person.objects.bulk_create(Person(name=f'Zed {i}') for i in range(45))
+
+    def setUp(self) -> None:
+        caches['default'].clear()
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+        self.expected = [str(pk) for pk in Person.objects.filter(name__startswith='Zed').order_by('pk').values_list('pk', flat=True)]
+
+    def get_page(self, **params: str) -> tuple[dict[str, Any], list[str]]:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {**self.params, **params})
+        person_queries = [query['sql'] for query in queries if 'testapp_person' in query['sql']]
+        return response.json(), person_queries
+
+    def test_pages_follow_cursors(self) -> None:
+        data, queries = self.get_page()
+        self.assertEqual([result['id'] for result in data['results']], self.expected[:20])
+        self.assertTrue(data['pagination']['more'])
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('COUNT', queries[0])
+        self.assertIn('LIMIT 21', queries[0])
+
+        # Select2 sends page numbers: the remembered cursor turns them into a pk seek
+        data, queries = self.get_page(page='2')
+        self.assertEqual([result['id'] for result in data['results']], self.expected[20:40])
+        self.assertNotIn('OFFSET', queries[0])
+
+        data, queries = self.get_page(cursor=data['pagination']['cursor'])
+        self.assertEqual([result['id'] for result in data['results']], self.expected[40:])
+        self.assertFalse(data['pagination']['more'])
+        self.assertIsNone(data['pagination']['cursor'])
+        self.assertNotIn('OFFSET', queries[0])
+
+    def test_offset_fallback(self) -> None:
+        data, queries = self.get_page(page='3')
+        self.assertEqual([result['id'] for result in data['results']], self.expected[40:])
+        self.assertFalse(data['pagination']['more'])
+        self.assertIn('OFFSET', queries[0])
+        self.assertNotIn('COUNT', queries[0])
+
+    def test_invalid_cursor_and_page(self) -> None:
+        data, _ = self.get_page(cursor='forged', page='x')
+        self.assertEqual([result['id'] for result in data['results']], self.expected[:20])
+
+
+class PersonLabelView(AutocompleteJsonView):
+    label_fields = ('name',)
+
+
+class PersonFriendLabelView(AutocompleteJsonView):
+    label_fields = ('name', 'best_friend__name')
+    label_format = '{name} ({best_friend__name})'
+    paginate_by = 2
+
+
+class ProjectionModeTests(TestCase):
+    """label_fields: results from values_list() rows instead of model instances."""
+
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': ''}
+
+    def get_json(self, view_cls: type[AutocompleteJsonView], **params: str) -> tuple[dict[str, Any], list[str]]:
+        request = RequestFactory().get(reverse('admin:admin-autocomplete'), {**self.params, **params})
+        request.user = User.objects.get(username=BASIC_USERNAME)
+        with CaptureQueriesContext(connection) as queries:
+            response = view_cls.as_view(admin_site=admin.site)(request)
+        return json.loads(response.content), [query['sql'] for query in queries if 'testapp_person' in query['sql']]
+
+    def test_same_results_as_instances(self) -> None:
+        expected, _ = self.get_json(AutocompleteJsonView)
+        data, queries = self.get_json(PersonLabelView)
+        self.assertEqual(data, expected)
+        self.assertTrue(all('favorite_food_id' not in sql for sql in queries))
+
+    def test_label_format_and_keyset(self) -> None:
+        people = Person.objects.select_related('best_friend').order_by('pk')
+        expected = [{'id': str(p.pk), 'text': f'{p.name} ({p.best_friend.name if p.best_friend else None})'} for p in people]
+        data, _ = self.get_json(PersonFriendLabelView)
+        self.assertEqual(data['results'], expected[:2])
+        with override_settings(ADMIN_AUTO_FILTERS_KEYSET_PAGINATION=True):
+            first, _ = self.get_json(PersonFriendLabelView)
+            second, _ = self.get_json(PersonFriendLabelView, cursor=first['pagination']['cursor'])
+        self.assertEqual(first['results'] + second['results'], expected[:4])
+
+
+class PersonFoodLabelView(AutocompleteJsonView):
+    @staticmethod
+    def display_text(obj: Any) -> str:
+        return f'{obj.name} ({obj.favorite_food})'
+
+
+class PersonFoodChoiceField(forms.ModelMultipleChoiceField):
+    def label_from_instance(self, obj: Any) -> str:
+        return f'{obj.name} ({obj.favorite_food})'
+
+
+class FriendsFoodLabelFilter(filters.AutocompleteFilterMultiple):
+    title = 'best friends'
+    field_name = 'best_friend'
+    rel_model = Person
+    parameter_name = 'best_friend__in'
+    form_field = PersonFoodChoiceField
+    label_select_related = ('favorite_food',)
+
+
+class LabelRelationsTests(QueryCountAssertionsMixin, TestCase):
+    """Declared label relations keep autocomplete results and widget labels free of N+1 queries."""
+
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': ''}
+
+    @classmethod
+    def setUpTestData(cls) -> None:
+        foods = Food.objects.order_by('pk')
+        Person.objects.bulk_create(Person(name=f'Eater {i}', favorite_food=foods[i % len(foods)]) for i in range(10))
+
+    def setUp(self) -> None:
+        filters.clear_filter_spec_cache()
+        self.addCleanup(filters.clear_filter_spec_cache)
+        self.user = User.objects.get(username=BASIC_USERNAME)
+
+    def test_view_label_relations(self) -> None:
+        with self.assertRaises(AssertionError):
+            self.assertAutocompleteQueriesConstant(self.params, self.user, admin.site, PersonFoodLabelView)
+        with mock.patch.object(PersonFoodLabelView, 'label_select_related', ('favorite_food',)):
+            self.assertAutocompleteQueriesConstant(self.params, self.user, admin.site, PersonFoodLabelView)
+        # Declared once on the target ModelAdmin, for every view
+        with mock.patch.object(PersonAdmin, 'label_select_related', ('favorite_food',), create=True):
+            self.assertAutocompleteQueriesConstant(self.params, self.user, admin.site, PersonFoodLabelView)
+
+    def test_widget_label_relations(self) -> None:
+        model_admin = admin.site.get_model_admin(Person)
+        pks = [str(pk) for pk in Person.objects.filter(name__startswith='Eater').values_list('pk', flat=True)]
+
+        def render(size: int) -> None:
+            request = RequestFactory().get(reverse('admin:testapp_person_changelist'))
+            request.user = self.user
+            friends_filter = FriendsFoodLabelFilter(request, {'best_friend__in': [','.join(pks[:size])]}, Person, model_admin)
+            self.assertEqual(friends_filter.rendered_widget.count('selected'), size)
+
+        self.assertConstantQueries(render, sizes=(1, 10))
+        with mock.patch.object(FriendsFoodLabelFilter, 'label_select_related', None):
+            filters.clear_filter_spec_cache()
+            with self.assertRaises(AssertionError):
+                self.assertConstantQueries(render, sizes=(1, 10))
+
+    def test_factory_argument(self) -> None:
+        filter_cls = filters.AutocompleteFilterFactory('best friend', 'best_friend', label_select_related=['favorite_food'])
+        spec = filter_cls.resolve_spec(Person, admin.site.get_model_admin(Person))
+        self.assertEqual(spec.select_related, ('favorite_food',))
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'))
+        request.user = self.user
+        queryset = filter_cls(request, {}, Person, admin.site.get_model_admin(Person)).get_field_queryset()
+        self.assertEqual(queryset.query.select_related, {'favorite_food': {}})
+
+
+class SearchBackendTests(TestCase):
+    """Custom search backends subclass SearchBackend."""
+
+    def test_search_is_abstract(self) -> None:
+        with self.assertRaises(TypeError):
+            SearchBackend()  # type: ignore[abstract]
+        incomplete = type('Backend', (SearchBackend,), {})
+        with self.assertRaises(TypeError):
+            incomplete()
+        self.assertIsInstance(ModelAdminSearchBackend(), SearchBackend)
+
+
+@override_settings(ADMIN_AUTO_FILTERS_SEARCH_BACKEND='admin_auto_filters.search.NgramSearchBackend')
+class NgramIndexTests(TestCase):
+    """The in-process n-gram index answers icontains searches like the database, and tracks writes."""
+
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'favorite_food'}
+
+    def setUp(self) -> None:
+        caches['default'].clear()
+        clear_ngram_indexes()
+        self.addCleanup(clear_ngram_indexes)
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+
+    def search(self, term: str, **params: str) -> tuple[list[str], list[str]]:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:admin-autocomplete'), {**self.params, 'term': term, **params})
+        return [result['text'] for result in response.json()['results']], [query['sql'] for query in queries]
+
+    def test_same_results_as_database(self) -> None:
+        Food.objects.create(name='Tomato Soup')
+        for term in ('a', 'sp', 'egg', 'TOAST', 'o e', '"tomato soup"', '1', 'to ma', 'zzz', ' '):
+            with self.subTest(term=term):
+                with override_settings(ADMIN_AUTO_FILTERS_SEARCH_BACKEND=ModelAdminSearchBackend):
+                    expected, _ = self.search(term)
+                self.assertEqual(self.search(term)[0], expected)
+
+    def test_searches_without_like(self) -> None:
+        self.search('spam')
+        texts, queries = self.search('spam')
+        self.assertEqual(texts, ['Spam'])
+        self.assertFalse([sql for sql in queries if 'LIKE' in sql])
+
+    def test_incremental_updates(self) -> None:
+        self.search('spam')
+        food = Food.objects.create(name='Spinach')
+        texts, queries = self.search('spin')
+        self.assertEqual(texts, ['Spinach'])
+        self.assertFalse([sql for sql in queries if 'COUNT' in sql and 'WHERE' not in sql])  # no rebuild
+        food.name = 'Kale'
+        food.save()
+        self.assertEqual(self.search('spin')[0], [])
+        self.assertEqual(self.search('kale')[0], ['Kale'])
+        food.delete()
+        self.assertEqual(self.search('kale')[0], [])
+
+    def test_missed_write_rebuilds(self) -> None:
+        self.search('spam')
+        Food.objects.filter(name='Spam').update(name='Ham')  # no signal
+        bump_generation(Food)  # as another process saving through a shared cache would
+        self.assertEqual(self.search('ham')[0], ['Ham'])
+
+    def test_write_in_process_that_never_searched(self) -> None:
+        self.search('spam')
+        with fresh_process():
+            # AdminAutoFiltersConfig.ready() tracks the model without any search or index
+            views.track_autocomplete_targets(admin.site)
+            food = Food.objects.get(name='Spam')
+            food.name = 'Ham'
+            food.save()
+        self.assertEqual(self.search('ham')[0], ['Ham'])
+        self.assertEqual(self.search('spam')[0], [])
+
+    def test_database_fallbacks(self) -> None:
+        with override_settings(ADMIN_AUTO_FILTERS_NGRAM_INDEX_MAX_ROWS=2):
+            self.assertTrue([sql for sql in self.search('spam')[1] if 'LIKE' in sql])
+        with override_settings(ADMIN_AUTO_FILTERS_NGRAM_INDEX_MAX_MATCHES=1):
+            self.assertTrue([sql for sql in self.search('o')[1] if 'LIKE' in sql])
+        # PersonAdmin.search_fields span relations
+        params = {'model_name': 'food', 'field_name': 'person'}
+        self.assertTrue([sql for sql in self.search('alice', **params)[1] if 'LIKE' in sql])
+
+
+class SQLiteFTS5SearchBackendTests(TestCase):
+    """The FTS5 backend gives the same results as icontains lookups and follows every kind of write."""
+
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'favorite_food'}
+
+    class FTS5View(AutocompleteJsonView):
+        search_backend = SQLiteFTS5SearchBackend
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # Outside the test transactions: SQLite can't roll back to a savepoint older than a virtual table
+        SQLiteFTS5SearchBackend().ensure_table(Food, ('id', 'name'), 'default')
+        super().setUpClass()
+
+    def setUp(self) -> None:
+        self.user = User.objects.get(username=BASIC_USERNAME)
+
+    def search(self, term: str, view_cls: Any = None) -> tuple[list[str], list[str]]:
+        request = RequestFactory().get('/', {**self.params, 'term': term})
+        request.user = self.user
+        view = (view_cls or self.FTS5View).as_view(admin_site=admin.site)
+        with CaptureQueriesContext(connection) as queries:
+            response = view(request)
+        return [result['text'] for result in json.loads(response.content)['results']], [query['sql'] for query in queries]
+
+    def test_same_results_as_database(self) -> None:
+        Food.objects.create(name='Tomato Soup')
+        for term in ('a', 'sp', 'egg', 'TOAST', 'o e', '"tomato soup"', 'mat sou', 'zzz', ' '):
+            with self.subTest(term=term):
+                expected, _ = self.search(term, AutocompleteJsonView)
+                self.assertEqual(self.search(term)[0], expected)
+
+    def test_matches_without_like(self) -> None:
+        texts, queries = self.search('toma')
+        self.assertEqual(texts, ['Tomatoes'])
+        self.assertTrue([sql for sql in queries if 'MATCH' in sql])
+        self.assertFalse([sql for sql in queries if 'LIKE' in sql])
+
+    def test_short_words_use_database(self) -> None:
+        texts, queries = self.search('sp')
+        self.assertEqual(texts, ['Spam'])
+        self.assertTrue([sql for sql in queries if 'LIKE' in sql])
+
+    def test_triggers_follow_writes(self) -> None:
+        self.search('spam')
+        food = Food.objects.create(name='Spinach')
+        self.assertEqual(self.search('spin')[0], ['Spinach'])
+        Food.objects.filter(pk=food.pk).update(name='Kale')  # no signal
+        self.assertEqual(self.search('spin')[0], [])
+        self.assertEqual(self.search('kale')[0], ['Kale'])
+        food.delete()
+        self.assertEqual(self.search('kale')[0], [])
+
+    def test_relation_search_fields_use_database(self) -> None:
+        # PersonAdmin.search_fields span relations
+        self.params = {'app_label': 'testapp', 'model_name': 'food', 'field_name': 'person'}
+        texts, queries = self.search('alice')
+        self.assertEqual(texts, self.search('alice', AutocompleteJsonView)[0])
+        self.assertFalse([sql for sql in queries if 'MATCH' in sql])
+
+
+@override_settings(ADMIN_AUTO_FILTERS_TIERED_SEARCH=True)
+class TieredSearchTests(TestCase):
+    """Exact and prefix matches on indexed fields come first, and the full search only fills the page."""
+
+    params = {'app_label': 'testapp', 'model_name': 'bugreport', 'field_name': 'reward_coupon'}
+
+    def setUp(self) -> None:
+        for code in ('XABC', 'ABCD', 'ABC', 'ZZZ'):
+            Coupon.objects.create(code=code)
+        self.user = User.objects.get(username=BASIC_USERNAME)
+
+    def search(self, term: str, page: int = 1, paginate_by: int = 20) -> tuple[list[str], bool, list[str]]:
+        request = RequestFactory().get('/', {**self.params, 'term': term, 'page': str(page)})
+        request.user = self.user
+        view_cls: Any = type('View', (AutocompleteJsonView,), {'paginate_by': paginate_by})
+        with CaptureQueriesContext(connection) as queries:
+            response = view_cls.as_view(admin_site=admin.site)(request)
+        payload = json.loads(response.content)
+        return [result['text'] for result in payload['results']], payload['pagination']['more'], [query['sql'] for query in queries]
+
+    def test_tiers_in_order(self) -> None:
+        self.assertEqual(self.search('ABC')[0], ['ABC', 'ABCD', 'XABC'])
+        with override_settings(ADMIN_AUTO_FILTERS_TIERED_SEARCH=False):
+            self.assertEqual(self.search('ABC')[0], ['XABC', 'ABCD', 'ABC'])
+
+    def test_full_page_skips_icontains(self) -> None:
+        texts, more, queries = self.search('ABC', paginate_by=1)
+        self.assertEqual((texts, more), (['ABC'], True))
+        self.assertFalse([sql for sql in queries if "'%ABC%'" in sql])
+        self.assertFalse([sql for sql in queries if 'COUNT' in sql])
+
+    def test_pages(self) -> None:
+        self.assertEqual(self.search('ABC', page=2, paginate_by=1)[:2], (['ABCD'], True))
+        self.assertEqual(self.search('ABC', page=3, paginate_by=1)[:2], (['XABC'], False))
+        self.assertEqual(self.search('ABC', page=4, paginate_by=1)[:2], ([], False))
+
+    def test_pages_of_unordered_model(self) -> None:
+        for code in ('1ABC', '2ABC', '3ABC'):
+            Coupon.objects.create(code=code)
+        pages = [self.search('ABC', page=page, paginate_by=2) for page in (1, 2, 3)]
+        texts = [text for page_texts, _, _ in pages for text in page_texts]
+        self.assertEqual(texts, ['ABC', 'ABCD', 'XABC', '1ABC', '2ABC', '3ABC'])
+        self.assertEqual([more for _, more, _ in pages], [True, True, False])
+        # Coupon and CouponAdmin have no ordering: the full search is ordered by pk like the prefix tiers
+        full_search = [sql for sql in pages[2][2] if "'%ABC%'" in sql]
+        self.assertTrue(full_search)
+        self.assertTrue(all('ORDER BY' in sql for sql in full_search))
+
+    def test_untiered_terms(self) -> None:
+        with override_settings(ADMIN_AUTO_FILTERS_TIERED_SEARCH=False):
+            expected = {term: self.search(term)[0] for term in ('', 'ABC ZZZ', 'zz')}
+        for term, texts in expected.items():
+            with self.subTest(term=term):
+                self.assertEqual(self.search(term)[0], texts)
+
+    def test_tier_fields(self) -> None:
+        self.assertEqual(get_tier_fields(admin.site.get_model_admin(Coupon), ['code']), (('code',), ('code',)))
+        self.assertEqual(get_tier_fields(admin.site.get_model_admin(Coupon), ['=code']), (('code',), ()))
+        # Food.name has no index; Person's search fields span relations
+        self.assertIsNone(get_tier_fields(admin.site.get_model_admin(Food), ['id', 'name']))
+        self.assertIsNone(get_tier_fields(admin.site.get_model_admin(Person), ['best_friend__name']))
+
+
+@override_settings(ADMIN_AUTO_FILTERS_MIN_TERM_LENGTH=3)
+class MinTermLengthTests(TestCase):
+    """Short terms skip the search: an empty page, or the cached top results containing them."""
+
+    url = reverse_lazy('admin:admin-autocomplete')
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend'}
+
+    def setUp(self) -> None:
+        caches['default'].clear()
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+
+    def search(self, term: str, **params: str) -> tuple[list[str], list[str]]:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {**self.params, 'term': term, **params})
+        person_queries = [query['sql'] for query in queries if 'testapp_person' in query['sql']]
+        return [result['text'] for result in response.json()['results']], person_queries
+
+    def test_empty_page(self) -> None:
+        self.assertEqual(self.search('al'), ([], []))
+        self.assertEqual(self.search('ali')[0], ['Alice', 'Bob', 'Carol'])  # Bob and Carol by best friend
+
+    @override_settings(ADMIN_AUTO_FILTERS_SHORT_TERM_RESULTS=2)
+    def test_cached_top_results(self) -> None:
+        self.assertEqual(self.search('')[0], ['Alice', 'Bob'])
+        self.assertEqual(self.search('b'), (['Bob'], []))
+        self.assertEqual(self.search('ca'), ([], []))  # Carol is not in the top 2
+        Person.objects.get(pk=2).save()
+        self.assertTrue(self.search('b')[1])  # generation moved
+
+    def test_filter_can_only_raise_minimum(self) -> None:
+        self.assertEqual(self.search('alic', min_term_length='5')[0], [])
+        self.assertEqual(self.search('al', min_term_length='1')[0], [])
+        self.assertEqual(self.search('al', min_term_length='x')[0], [])
+        with override_settings(ADMIN_AUTO_FILTERS_MIN_TERM_LENGTH=0):
+            self.assertEqual(self.search('al', min_term_length='1')[0], ['Alice', 'Bob', 'Carol'])
+
+    def test_filter_autocomplete_params(self) -> None:
+        filter_cls = filters.AutocompleteFilterFactory('best friend', 'best_friend', min_term_length=3)
+        self.assertEqual(filter_cls.__new__(filter_cls).get_autocomplete_params(), {'min_term_length': '3'})
+        self.assertEqual(FriendFilter.__new__(FriendFilter).get_autocomplete_params(), {})
+
+
+class SingleFlightTests(TestCase):
+    """Concurrent identical requests share one computation."""
+
+    def run_concurrently(self, flight: SingleFlight, func: Any) -> list[Any]:
+        results: list[Any] = []
+
+        def call() -> None:
+            try:
+                results.append(flight.do('key', func))
+            except RuntimeError as exc:
+                results.append(exc)
+
+        threads = [threading.Thread(target=call) for _ in range(3)]
+        threads[0].start()
+        self.started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        time.sleep(0.1)  # let the followers reach the flight
+        self.release.set()
+        for thread in threads:
+            thread.join(5)
+        return results
+
+    def setUp(self) -> None:
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.calls = 0
+
+    def slow(self) -> dict[str, int]:
+        self.calls += 1
+        self.started.set()
+        self.release.wait(5)
+        return {'calls': self.calls}
+
+    def test_followers_share_result(self) -> None:
+        results = self.run_concurrently(SingleFlight(), self.slow)
+        self.assertEqual(results, [{'calls': 1}] * 3)
+        self.assertEqual(self.calls, 1)
+
+    def test_followers_retry_after_failure(self) -> None:
+        def fail_first() -> int:
+            self.calls += 1
+            if self.calls == 1:
+                self.started.set()
+                self.release.wait(5)
+                raise RuntimeError('boom')
+            return self.calls
+
+        results = self.run_concurrently(SingleFlight(), fail_first)
+        self.assertEqual(len([result for result in results if isinstance(result, RuntimeError)]), 1)
+        self.assertEqual(self.calls, 3)
+
+    @override_settings(ADMIN_AUTO_FILTERS_COALESCE_REQUESTS=True)
+    def test_view_coalesces_identical_requests(self) -> None:
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+        params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': 'a'}
+        with mock.patch.object(views._flights, 'do', wraps=views._flights.do) as do:
+            texts = self.client.get(reverse('admin:admin-autocomplete'), params).json()['results']
+            self.client.get(reverse('admin:admin-autocomplete'), params)
+            self.client.get(reverse('admin:admin-autocomplete'), {**params, 'page': '2'})
+        self.assertEqual([result['text'] for result in texts], ['Alice', 'Bob', 'Carol', 'David'])
+        keys = [call.args[0] for call in do.call_args_list]
+        self.assertEqual(keys[0], keys[1])
+        self.assertNotEqual(keys[0], keys[2])
+
+
+class AsyncAutocompleteTests(TestCase):
+    """The async view answers like the sync one, with the same permission checks."""
+
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend'}
+
+    def setUp(self) -> None:
+        caches['default'].clear()
+        user = User.objects.get(username=BASIC_USERNAME)
+        self.client.force_login(user)
+        self.async_client.force_login(user)
+
+    async def test_same_results_as_sync_view(self) -> None:
+        for params in ({'term': ''}, {'term': 'a'}, {'term': 'a', 'page': '2'}, {'term': 'zzz'}):
+            with self.subTest(**params):
+                sync_response = await sync_to_async(self.client.get)(reverse('admin:admin-autocomplete'), {**self.params, **params})
+                expected = sync_response.json() if sync_response.status_code == 200 else None
+                response = await self.async_client.get(reverse('admin:async_autocomplete'), {**self.params, **params})
+                self.assertEqual(response.status_code, 200 if expected else 404)
+                if expected:
+                    self.assertEqual(response.json(), expected)
+                    self.assertIn('no-cache', response['Cache-Control'])
+
+    async def test_pages_without_count(self) -> None:
+        view_cls: Any = type('View', (AsyncAutocompleteJsonView,), {'paginate_by': 2})
+        request = RequestFactory().get('/', {**self.params, 'term': ''})
+        request.user = await sync_to_async(User.objects.get)(username=BASIC_USERNAME)
+        with mock.patch.object(AsyncAutocompleteJsonView, 'paginate_queryset', side_effect=AssertionError('Paginator used')):
+            response = await view_cls.as_view(admin_site=admin.site)(request)
+        self.assertEqual(json.loads(response.content)['pagination'], {'more': True})
+
+    async def test_labels_reading_relations(self) -> None:
+        def display_text(obj: Any) -> str:
+            return f'{obj.name} ({obj.favorite_food})'
+
+        attrs = {'display_text': staticmethod(display_text)}
+        request = RequestFactory().get('/', {**self.params, 'term': ''})
+        request.user = await sync_to_async(User.objects.get)(username=BASIC_USERNAME)
+        sync_view = type('View', (AutocompleteJsonView,), attrs).as_view(admin_site=admin.site)
+        expected = json.loads((await sync_to_async(sync_view)(request)).content)
+        response = await type('View', (AsyncAutocompleteJsonView,), attrs).as_view(admin_site=admin.site)(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), expected)
+        self.assertIn('(None)', str(expected))
+
+    async def test_permissions(self) -> None:
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(reverse('admin:async_autocomplete'), {**self.params, 'term': ''})
+        self.assertEqual(response.status_code, 302)
+        await sync_to_async(self.async_client.force_login)(await sync_to_async(User.objects.get)(username=BASIC_USERNAME))
+        response = await self.async_client.get(reverse('admin:async_autocomplete'), {**self.params, 'field_name': 'nope'})
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(ADMIN_AUTO_FILTERS_MIN_TERM_LENGTH=2)
+    async def test_sync_only_features_fall_back(self) -> None:
+        response = await self.async_client.get(reverse('admin:async_autocomplete'), {**self.params, 'term': 'a'})
+        self.assertEqual(response.json()['results'], [])
+
+
+class ConditionalResponseTests(TestCase):
+    """ETags and Cache-Control of autocomplete responses."""
+
+    url = reverse_lazy('admin:admin-autocomplete')
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend', 'term': 'a'}
+
+    def setUp(self) -> None:
+        caches['default'].clear()
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+
+    def get(self, etag: str | None = None, **params: str) -> tuple[Any, list[str]]:
+        headers = {'If-None-Match': etag} if etag else {}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {**self.params, **params}, headers=headers)
+        return response, [query['sql'] for query in queries if 'testapp_person' in query['sql']]
+
+    def test_never_cache_by_default(self) -> None:
+        response, _ = self.get()
+        self.assertNotIn('ETag', response)
+        self.assertIn('no-store', response['Cache-Control'])
+
+    @override_settings(ADMIN_AUTO_FILTERS_ETAGS='payload')
+    def test_payload_etag(self) -> None:
+        response, _ = self.get()
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertNotIn('no-store', response['Cache-Control'])
+        not_modified, _ = self.get(response['ETag'])
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        self.assertEqual(self.get(response['ETag'], term='zzz')[0].status_code, 200)
+
+    @override_settings(ADMIN_AUTO_FILTERS_ETAGS='generation')
+    def test_generation_etag_skips_search(self) -> None:
+        response, _ = self.get()
+        not_modified, queries = self.get(response['ETag'])
+        self.assertEqual((not_modified.status_code, queries), (304, []))
+        Person.objects.get(pk=1).save()
+        modified, _ = self.get(response['ETag'])
+        self.assertEqual(modified.status_code, 200)
+        self.assertNotEqual(modified['ETag'], response['ETag'])
+
+    @override_settings(ADMIN_AUTO_FILTERS_ETAGS='generation')
+    def test_generation_etag_after_write_in_other_process(self) -> None:
+        response, _ = self.get()
+        with fresh_process():
+            # A process that never served an autocomplete request, after AdminAutoFiltersConfig.ready()
+            views.track_autocomplete_targets(admin.site)
+            Person.objects.get(pk=1).save()
+        modified, _ = self.get(response['ETag'])
+        self.assertEqual(modified.status_code, 200)
+        self.assertNotEqual(modified['ETag'], response['ETag'])
+
+    @override_settings(ADMIN_AUTO_FILTERS_BROWSER_CACHE_MAX_AGE=30)
+    def test_max_age(self) -> None:
+        response, _ = self.get()
+        self.assertEqual(set(response['Cache-Control'].split(', ')), {'private', 'max-age=30'})
+        self.assertIn('Cookie', response['Vary'])
+
+    @override_settings(ADMIN_AUTO_FILTERS_ETAGS='weak')
+    def test_unknown_mode(self) -> None:
+        with self.assertRaises(exceptions.ImproperlyConfigured):
+            self.get()
+
+
+class DeferredFriendsFilter(filters.AutocompleteFilterMultiple):
+    title = 'best friends'
+    field_name = 'best_friend'
+    rel_model = Person
+    parameter_name = 'best_friend__in'
+    defer_labels = True
+
+
+class LabelsEndpointTests(TestCase):
+    """The labels endpoint, and filters rendering placeholders it labels."""
+
+    url = reverse_lazy('admin:admin-autocomplete-labels')
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend'}
+
+    def setUp(self) -> None:
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+
+    def get_labels(self, ids: list[str], **params: str) -> tuple[Any, list[str]]:
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {**self.params, 'ids': ids, **params})
+        return response, [query['sql'] for query in queries if 'testapp_person' in query['sql']]
+
+    def test_labels_in_order_from_one_query(self) -> None:
+        response, queries = self.get_labels(['3', '1', 'x', '999', '3'])
+        self.assertEqual(response.json(), {'results': [{'id': '3', 'text': 'Carol'}, {'id': '1', 'text': 'Alice'}]})
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(self.get_labels([])[0].json(), {'results': []})
+
+    def test_out_of_range_ids(self) -> None:
+        response, _ = self.get_labels(['99999999999999999999', '2'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'results': [{'id': '2', 'text': 'Bob'}]})
+
+    def test_max_ids(self) -> None:
+        with mock.patch.object(views.AutocompleteLabelsView, 'max_ids', 1):
+            self.assertEqual(len(self.get_labels(['1', '2'])[0].json()['results']), 1)
+
+    def test_permissions(self) -> None:
+        staff = User.objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(self.get_labels(['1'])[0].status_code, 403)
+        staff.user_permissions.add(Permission.objects.get(codename='view_person'))
+        self.assertEqual(self.get_labels(['1'])[0].status_code, 200)
+        self.assertEqual(self.get_labels(['1'], field_name='nope')[0].status_code, 403)
+
+    def test_deferred_filter_renders_placeholders(self) -> None:
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'))
+        request.user = User.objects.get(username=BASIC_USERNAME)
+        friends_filter = DeferredFriendsFilter(request, {'best_friend__in': ['1,2']}, Person, admin.site.get_model_admin(Person))
+        with CaptureQueriesContext(connection) as queries:
+            html = friends_filter.rendered_widget
+        self.assertFalse([query for query in queries if 'testapp_person' in query['sql']])
+        self.assertIn(f'data-labels-url="{self.url}"', html)
+        self.assertIn('<option value="1" selected>1</option>', html)
+        self.assertIn('<option value="2" selected>2</option>', html)
+        self.assertNotIn('Alice', html)
+
+    def test_factory_argument(self) -> None:
+        filter_cls = filters.AutocompleteFilterFactory('best friend', 'best_friend', defer_labels=True)
+        self.assertTrue(filter_cls.defer_labels)
+        self.assertFalse(filters.AutocompleteFilterFactory('best friend', 'best_friend').defer_labels)
+
+    def test_custom_labels_not_deferred(self) -> None:
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'))
+        request.user = User.objects.get(username=BASIC_USERNAME)
+        model_admin = admin.site.get_model_admin(Person)
+
+        def render(filter_cls: Any) -> str:
+            return filter_cls(request, {'best_friend': ['1']}, Person, model_admin).rendered_widget
+
+        self.assertIn('data-labels-url', render(filters.AutocompleteFilterFactory('best friend', 'best_friend', defer_labels=True)))
+        label_by = filters.AutocompleteFilterFactory('best friend', 'best_friend', label_by=lambda person: person.name.upper(), defer_labels=True)
+        self.assertIn('<option value="1" selected>ALICE</option>', render(label_by))
+        viewname = filters.AutocompleteFilterFactory('best friend', 'best_friend', viewname='admin:testapp_person_changelist', defer_labels=True)
+        html = render(viewname)
+        self.assertNotIn('data-labels-url', html)
+        self.assertIn('<option value="1" selected>Alice</option>', html)
+        labels_url = type('Filter', (label_by,), {'get_labels_url': lambda _self: '/labels/'})
+        self.assertIn('data-labels-url="/labels/"', render(labels_url))
+
+
+class BatchEndpointTests(TestCase):
+    """Several autocomplete queries in one request."""
+
+    url = reverse_lazy('admin:admin-autocomplete-batch')
+    friend = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'best_friend'}
+    food = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'favorite_food'}
+
+    def setUp(self) -> None:
+        self.client.force_login(User.objects.get(username=BASIC_USERNAME))
+
+    def get_batch(self, *queries: dict[str, str]) -> Any:
+        return self.client.get(self.url, {'q': [urlencode(query) for query in queries]})
+
+    def test_payloads_in_order(self) -> None:
+        queries = ({**self.food, 'term': 'to'}, {**self.friend, 'term': 'ali'}, self.food)
+        response = self.get_batch(*queries)
+        self.assertEqual(response.status_code, 200)
+        singles = [self.client.get(reverse('admin:admin-autocomplete'), query).json() for query in queries]
+        self.assertEqual(response.json(), {'results': singles})
+        self.assertEqual([result['text'] for result in singles[0]['results']], ['Toast', 'Tomatoes'])
+
+    def test_post(self) -> None:
+        response = self.client.post(self.url, {'q': [urlencode({**self.food, 'term': 'spam'})]})
+        self.assertEqual(response.json(), {'results': [{'results': [{'id': '1', 'text': 'Spam'}], 'pagination': {'more': False}}]})
+
+    def test_errors_per_query(self) -> None:
+        response = self.get_batch({**self.friend, 'field_name': 'nope'}, {**self.friend, 'term': 'alice', 'page': '9'}, self.friend)
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(results[:2], [{'error': 403}, {'error': 404}])
+        self.assertEqual(len(results[2]['results']), 4)
+
+    def test_targets_resolved_once(self) -> None:
+        with mock.patch.object(PersonAdmin, 'has_view_permission', autospec=True, return_value=True) as has_view_permission:
+            response = self.get_batch(*({**self.friend, 'term': term} for term in ('a', 'b', 'c')))
+        self.assertEqual(len(response.json()['results']), 3)
+        self.assertEqual(has_view_permission.call_count, 1)
+
+    def test_permissions(self) -> None:
+        staff = User.objects.create_user('staff', is_staff=True)
+        staff.user_permissions.add(Permission.objects.get(codename='view_food'))
+        self.client.force_login(staff)
+        results = self.get_batch(self.friend, self.food).json()['results']
+        self.assertEqual(results[0], {'error': 403})
+        self.assertEqual(len(results[1]['results']), 5)
+
+    def test_max_queries(self) -> None:
+        with mock.patch.object(views.AutocompleteBatchView, 'max_queries', 1):
+            self.assertEqual(self.get_batch(self.friend, self.food).status_code, 400)
+
+
+class ReplicaFoodFilter(filters.AutocompleteFilter):
+    title = 'favorite food'
+    field_name = 'favorite_food'
+    using = 'replica'
+
+
+class ReadDatabaseTests(TestCase):
+    """Autocomplete searches and label lookups on another database alias."""
+
+    databases = {'default', 'replica'}
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'favorite_food', 'term': 'spam'}
+
+    def setUp(self) -> None:
+        Food.objects.using('replica').filter(name='Spam').update(name='Spam (replica)')
+        self.user = User.objects.get(username=BASIC_USERNAME)
+        filters.clear_filter_spec_cache()
+        self.addCleanup(filters.clear_filter_spec_cache)
+
+    def get_texts(self, view_cls: type[AutocompleteJsonView] = AutocompleteJsonView) -> list[str]:
+        request = RequestFactory().get('/', self.params)
+        request.user = self.user
+        response = view_cls.as_view(admin_site=admin.site)(request)
+        return [result['text'] for result in json.loads(response.content)['results']]
+
+    def get_filter_html(self, filter_cls: type[filters.AutocompleteFilterBase]) -> str:
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'))
+        request.user = self.user
+        model_admin = admin.site.get_model_admin(Person)
+        params = {filter_cls.resolve_spec(Person, model_admin).parameter_name: str(Food.objects.get(name='Spam').pk)}
+        return filter_cls(request, params, Person, model_admin).rendered_widget
+
+    def break_replica(self) -> None:
+        # Rolled back with the test's transaction on the replica
+        with connections['replica'].cursor() as cursor:
+            cursor.execute('ALTER TABLE testapp_food RENAME TO testapp_food_gone')
+
+    def test_default(self) -> None:
+        self.assertEqual(self.get_texts(), ['Spam'])
+
+    @override_settings(ADMIN_AUTO_FILTERS_READ_DATABASE='replica')
+    def test_setting(self) -> None:
+        self.assertEqual(self.get_texts(), ['Spam (replica)'])
+        html = self.get_filter_html(filters.AutocompleteFilterFactory('food', 'favorite_food'))
+        self.assertIn('>Spam (replica)</option>', html)
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('admin:admin-autocomplete-labels'), {**self.params, 'ids': ['1']})
+        self.assertEqual(response.json(), {'results': [{'id': '1', 'text': 'Spam (replica)'}]})
+
+    @override_settings(ADMIN_AUTO_FILTERS_READ_DATABASE='replica', ADMIN_AUTO_FILTERS_SEARCH_BACKEND='admin_auto_filters.search.NgramSearchBackend')
+    def test_ngram_index_on_replica(self) -> None:
+        clear_ngram_indexes()
+        self.addCleanup(clear_ngram_indexes)
+        self.assertEqual(self.get_texts(), ['Spam (replica)'])
+        food = Food.objects.create(name='Zucchini')
+        # Replication sends no signals
+        Food.objects.using('replica').bulk_create([Food(pk=food.pk, name='Zucchini')])
+        self.params = {**self.params, 'term': 'zucchini'}
+        self.assertEqual(self.get_texts(), ['Zucchini'])
+
+    def test_attributes(self) -> None:
+        view_cls = type('ReplicaView', (AutocompleteJsonView,), {'using': 'replica'})
+        self.assertEqual(self.get_texts(view_cls), ['Spam (replica)'])
+        self.assertIn('>Spam (replica)</option>', self.get_filter_html(ReplicaFoodFilter))
+        factory_filter = filters.AutocompleteFilterFactory('food', 'favorite_food', using='replica')
+        self.assertIn('>Spam (replica)</option>', self.get_filter_html(factory_filter))
+
+    @override_settings(ADMIN_AUTO_FILTERS_READ_DATABASE='replica')
+    def test_without_fallback(self) -> None:
+        self.break_replica()
+        with self.assertRaises(OperationalError):
+            self.get_texts()
+        with self.assertRaises(OperationalError):
+            self.get_filter_html(ReplicaFoodFilter)
+
+    @override_settings(ADMIN_AUTO_FILTERS_READ_DATABASE='replica', ADMIN_AUTO_FILTERS_READ_DATABASE_FALLBACK=True)
+    def test_fallback(self) -> None:
+        self.break_replica()
+        with self.assertLogs('admin_auto_filters.routing', 'WARNING'):
+            self.assertEqual(self.get_texts(), ['Spam'])
+        with self.assertLogs('admin_auto_filters.routing', 'WARNING'):
+            self.assertIn('>Spam</option>', self.get_filter_html(ReplicaFoodFilter))
+
+    @override_settings(ADMIN_AUTO_FILTERS_READ_DATABASE='replica')
+    async def test_async_view(self) -> None:
+        request = RequestFactory().get('/', self.params)
+        request.user = self.user
+        response = await AsyncAutocompleteJsonView.as_view(admin_site=admin.site)(request)
+        self.assertEqual([result['text'] for result in json.loads(response.content)['results']], ['Spam (replica)'])
+
+
+class QueryTimeoutTests(TestCase):
+    """Autocomplete result queries cancelled after a time budget, returning partial results."""
+
+    params = {'app_label': 'testapp', 'model_name': 'person', 'field_name': 'favorite_food', 'term': 'bulk'}
+
+    def setUp(self) -> None:
+        caches['default'].clear()
+        Food.objects.bulk_create(Food(name=f'Bulk {i:03d}') for i in range(200))
+        self.user = User.objects.get(username=BASIC_USERNAME)
+        self.view_cls: Any = type('View', (AutocompleteJsonView,), {'query_timeout': 60, 'paginate_by': 100, 'budget_chunk_size': 5})
+
+    def get(self, view_cls: Any = None, checks: int | None = None, **params: str) -> Any:
+        """The view's response, with the deadline passing after `checks` SQLite progress checks."""
+        request = RequestFactory().get('/', {**self.params, **params})
+        request.user = self.user
+        view = (view_cls or self.view_cls).as_view(admin_site=admin.site)
+        if checks is None:
+            return view(request)
+        counter = itertools.count()
+        with mock.patch('admin_auto_filters.budget.time') as fake_time, mock.patch.object(QueryBudget, 'progress_steps', 10):
+            fake_time.monotonic.side_effect = lambda: 0.0 if next(counter) < checks else float('inf')
+            return view(request)
+
+    def test_partial_results(self) -> None:
+        complete = json.loads(self.get().content)
+        self.assertNotIn('truncated', complete)
+        self.assertEqual(len(complete['results']), 100)
+        self.assertTrue(complete['pagination']['more'])
+
+        response = self.get(checks=50)
+        self.assertEqual(response.status_code, 200)
+        partial = json.loads(response.content)
+        self.assertTrue(partial['truncated'])
+        self.assertEqual(partial['pagination'], {'more': False})
+        self.assertTrue(0 < len(partial['results']) < 100)
+        self.assertEqual(partial['results'], complete['results'][: len(partial['results'])])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
+
+    def test_interrupted_at_once(self) -> None:
+        self.assertEqual(json.loads(self.get(checks=0).content), {'results': [], 'pagination': {'more': False}, 'truncated': True})
+
+    def test_no_query_after_deadline(self) -> None:
+        view_cls = type('View', (self.view_cls,), {'query_timeout': 1e-9})
+        with CaptureQueriesContext(connection) as queries:
+            payload = json.loads(self.get(view_cls).content)
+        self.assertEqual(payload, {'results': [], 'pagination': {'more': False}, 'truncated': True})
+        self.assertFalse([query for query in queries if 'testapp_food' in query['sql']])
+
+    def test_partial_results_not_cached(self) -> None:
+        view_cls = type('View', (self.view_cls,), {'cache_results': True})
+        self.assertTrue(json.loads(self.get(view_cls, checks=50).content)['truncated'])
+        self.assertNotIn('truncated', json.loads(self.get(view_cls).content))
+
+    def test_tiered_and_keyset(self) -> None:
+        for attrs in ({'tiered_search': True}, {'keyset_pagination': True}):
+            with self.subTest(**attrs):
+                view_cls = type('View', (self.view_cls,), attrs)
+                self.assertNotIn('truncated', json.loads(self.get(view_cls).content))
+                self.assertEqual(json.loads(self.get(view_cls, checks=0).content)['results'], [])
+
+    def test_outer_transaction(self) -> None:
+        with transaction.atomic():
+            Food.objects.create(name='Bulk extra')
+            self.assertTrue(json.loads(self.get(checks=50).content)['truncated'])
+            # The progress handler, whose deadline has passed, is gone with the budget
+            self.assertEqual(Food.objects.filter(name__startswith='Bulk').count(), 201)
+            self.assertNotIn('truncated', json.loads(self.get().content))
+
+    def test_postgresql_statement_timeouts(self) -> None:
+        budget = QueryBudget('default', 100.0)
+        fake = mock.MagicMock(vendor='postgresql', alias='default', in_atomic_block=True, needs_rollback=False)
+        cursor = fake.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = ('30s',)
+        budget.connection = fake
+        statement = mock.MagicMock()
+        execute = mock.Mock(return_value='rows')
+        with (
+            mock.patch('admin_auto_filters.budget.transaction.atomic', return_value=nullcontext()),
+            mock.patch('admin_auto_filters.budget.time') as fake_time,
+        ):
+            with budget:
+                limit_statement = fake.execute_wrapper.call_args.args[0]
+                # Each statement gets the time left, not the whole budget
+                for now in (99.0, 99.75):
+                    fake_time.monotonic.return_value = now
+                    self.assertEqual(limit_statement(execute, 'SELECT 1', (), False, {'cursor': statement}), 'rows')
+        self.assertEqual(
+            [call.args for call in statement.cursor.execute.call_args_list],
+            [('SET LOCAL statement_timeout = %s', [1000]), ('SET LOCAL statement_timeout = %s', [250])],
+        )
+        # Inside an outer transaction, the previous timeout is restored
+        self.assertEqual(
+            [call.args for call in cursor.execute.call_args_list],
+            [('SHOW statement_timeout',), ("SELECT set_config('statement_timeout', %s, true)", ['30s'])],
+        )
+        fake.in_atomic_block = False
+        cursor.execute.reset_mock()
+        with mock.patch('admin_auto_filters.budget.transaction.atomic', return_value=nullcontext()):
+            with budget:
+                pass
+        self.assertFalse(cursor.execute.called)
+
+    def test_other_errors_raise(self) -> None:
+        with mock.patch.object(QueryBudget, 'is_timeout', return_value=False):
+            with self.assertRaises(OperationalError):
+                self.get(checks=0)
+
+    def test_timeout_parameter(self) -> None:
+        request = RequestFactory().get('/', {**self.params, 'query_timeout': '0.5'})
+        view = self.view_cls(request=request)
+        self.assertEqual(view.get_query_timeout(), 0.5)
+        view.request = RequestFactory().get('/', {**self.params, 'query_timeout': '600'})
+        self.assertEqual(view.get_query_timeout(), 60)
+        view.request = RequestFactory().get('/', {**self.params, 'query_timeout': 'x'})
+        self.assertEqual(view.get_query_timeout(), 60)
+        view = AutocompleteJsonView(request=RequestFactory().get('/', self.params))
+        self.assertIsNone(view.get_query_timeout())
+        with override_settings(ADMIN_AUTO_FILTERS_QUERY_TIMEOUT=2):
+            self.assertEqual(view.get_query_timeout(), 2)
+
+    def test_filter_parameter(self) -> None:
+        filter_cls = filters.AutocompleteFilterFactory('food', 'favorite_food', query_timeout=0.5)
+        request = RequestFactory().get(reverse('admin:testapp_person_changelist'))
+        request.user = self.user
+        html = filter_cls(request, {}, Person, admin.site.get_model_admin(Person)).rendered_widget
+        self.assertIn('query_timeout=0.5', html)
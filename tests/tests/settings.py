@@ -63,6 +63,11 @@ DATABASES = {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
     },
+    # A second database with the same schema, standing in for a read replica
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+    },
 }
 
 AUTH_PASSWORD_VALIDATORS: list[dict[str, Any]] = []